@@ -8,7 +8,7 @@
 # Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
 #
 # Future possible improvements:
-# -- Add the ability to edit (change cells) of GUI puzzle, improve usability
+# -- Improve usability of the GUI
 # -- Enhance GUI to support 4x4 puzzles
 # -- Web app
 # -- Python2.7 version?
@@ -16,39 +16,167 @@
 
 import tkinter
 from tkinter.constants import *
-import copy
+import itertools
+import random
+import threading
+import time
+
+if hasattr(int, 'bit_count'):
+    def popcount(mask):
+        """Return the number of bits set in mask (i.e. the number of possible
+        values in a candidate bitmask)"""
+        return mask.bit_count()
+else:
+    def popcount(mask):
+        """Return the number of bits set in mask (i.e. the number of possible
+        values in a candidate bitmask)"""
+        return bin(mask).count('1')
+
+def lowest_bit(mask):
+    """Return mask with every bit except the lowest set bit cleared"""
+    return mask & -mask
+
+def value2bit(value):
+    """Return the candidate bitmask bit for a cell value (value 1 is bit 0)"""
+    return 1 << (value-1)
+
+def bit2value(bit):
+    """Return the cell value for a single candidate bitmask bit"""
+    return bit.bit_length()
+
+def mask2values(mask):
+    """Return a list of the cell values whose bits are set in mask, lowest
+    value first"""
+    values = []
+    while mask:
+        bit = mask & -mask
+        values.append(bit.bit_length())
+        mask ^= bit
+    return values
+
+def value2char(value):
+    """Return the character used to display a cell value: '-' for an empty
+    cell, 1-9, A-Z for 10-35, a-z, {, |, } for 36-64 and '*' above that"""
+    if value==0:
+        return '-'
+    if value<10:
+        return '%.1d' % (value)
+    if value<36:
+        return chr(value + 55) # Represent 10-35 as A-Z
+    if value<65:
+        return chr(value + 61) # Represent 36-64 as a-z, {, |, }
+    else: return '*' # Give up for values > 64
+
+def values2string(values):
+    """Return a flat list of cell values as a single line string, one
+    character per cell (see Sudoku.to_string)"""
+    return ''.join([value2char(value) for value in values])
+
+class IndexTables(object):
+    """Tables of flat cell indexes (row*max_val + col) for one puzzle size,
+    shared by every Sudoku puzzle of that size (see index_tables).
+    Attributes:
+    rows: a list of the indexes of the cells in each row
+    cols: a list of the indexes of the cells in each column
+    boxes: a list of the indexes of the cells in each box
+    units: rows, then cols, then boxes
+    cell_units: for each cell, the positions in units of its row, column
+          and box
+    peers: for each cell, the indexes of the other cells in its row,
+          column and box, each once
+    intersections: a list of (overlap, box_rest, line_rest) index lists, one
+          for each box and each row or column that crosses it; overlap holds
+          the cells the box and line share, box_rest and line_rest the other
+          cells of the box and of the line
+    """
+    def __init__(self, box_size):
+        max_val = box_size**2
+        self.rows = [list(range(row*max_val, (row+1)*max_val)) for row in range(max_val)]
+        self.cols = [list(range(col, max_val*max_val, max_val)) for col in range(max_val)]
+        self.boxes = []
+        for box_row in range(0, max_val, box_size):
+            for box_col in range(0, max_val, box_size):
+                self.boxes.append([r*max_val + c for r in range(box_row, box_row+box_size)
+                                                  for c in range(box_col, box_col+box_size)])
+        self.units = self.rows + self.cols + self.boxes
+        self.cell_units = [(r, max_val + c, 2*max_val + r // box_size * box_size + c // box_size)
+                           for r in range(max_val) for c in range(max_val)]
+        self.peers = []
+        for index, units in enumerate(self.cell_units):
+            peers = set()
+            for unit in units:
+                peers.update(self.units[unit])
+            peers.discard(index)
+            self.peers.append(sorted(peers))
+        self.intersections = []
+        for box in self.boxes:
+            box_cells = set(box)
+            for line in self.rows + self.cols:
+                overlap = [i for i in line if i in box_cells]
+                if overlap:
+                    self.intersections.append((overlap,
+                                               [i for i in box if i not in overlap],
+                                               [i for i in line if i not in box_cells]))
+
+_index_tables = {}
+
+def index_tables(box_size):
+    """Return the IndexTables for puzzles of box_size, building them the
+    first time they are asked for"""
+    tables = _index_tables.get(box_size)
+    if tables is None:
+        tables = _index_tables[box_size] = IndexTables(box_size)
+    return tables
 
 class Cell(object):
-    """A single cell inside a box inside the Sudoku board.
+    """A view of a single cell inside a box inside the Sudoku board.  The
+    cell's value and possible values live in the flat arrays of the Sudoku
+    puzzle that owns it, so a Cell holds nothing but its position.
     Attributes:
+    puzzle: the Sudoku puzzle this cell belongs to
+    index: position of this cell in the puzzle's flat arrays (row*max_val + col)
     value: the integer value of this cell (0 if not yet determined)
     possible: a list of integers that are possible values for this cell
     max_val: maximum numeric value of a cell"""
-    def __init__(self, value=0, max_val=9):
-        self.value = value
-        self.possible = []
-        self.max_val = max_val
-        if value==0:
-            for i in range(1, max_val+1):
-                self.possible.append(i)
+    __slots__ = ('puzzle', 'index')
+
+    def __init__(self, puzzle, index):
+        self.puzzle = puzzle
+        self.index = index
+
+    @property
+    def value(self):
+        return self.puzzle.values[self.index]
+
+    @property
+    def possible(self):
+        return mask2values(self.puzzle.possibles[self.index])
+
+    @property
+    def max_val(self):
+        return self.puzzle.max_val
 
     def __str__(self):
-        if self.value==0:
-            return '-'
-        if self.value<10:
-            return '%.1d' % (self.value)
-        if self.value<36:
-            return chr(self.value + 55) # Represent 10-35 as A-Z
-        if self.value<65:
-            return chr(self.value + 61) # Represent 36-64 as a-z, {, |, }
-        else: return '*' # Give up for values > 64
+        return value2char(self.value)
 
     def set(self, value):
-        self.__init__(value, self.max_val)
+        """Set the value of this cell without updating any other cell.  A
+        value of 0 makes every value possible again.  (To clear or change
+        a cell and update the rest of the puzzle, see Sudoku.unset_cell and
+        Sudoku.change_cell.)"""
+        self.puzzle.counts = None # Rebuilt from values when next needed
+        singles = self.puzzle.singles
+        if self.index in singles: # Its candidates are no longer known
+            singles[:] = [i for i in singles if i != self.index]
+        self.puzzle.cells_filled += (value!=0) - (self.value!=0)
+        self.puzzle.values[self.index] = value
+        if value==0:
+            self.puzzle.possibles[self.index] = self.puzzle.all_possible
+        else:
+            self.puzzle.possibles[self.index] = 0
 
     def remove_from_possible(self, value):
-        if value in self.possible:
-            self.possible.remove(value)
+        self.puzzle.remove_bits(value2bit(value), (self.index,))
 
 class Sudoku(object):
     """A representation of the entire Soduko puzzle.
@@ -57,25 +185,81 @@ class Sudoku(object):
           typical is 3, for a 3x3 puzzle
     max_val: maximum numeric value of a call (equals box_size squared)
     cells_filled: a count of the number of cells that are filled
-    cell: a list of lists (2 dimensional array) of Cell objects representing
-          each cell
+    all_possible: the candidate bitmask with every value 1..max_val possible
+    values: a flat list (row*max_val + col) of the integer value of each cell
+          (0 if not yet determined)
+    possibles: a flat list (row*max_val + col) of candidate bitmasks, one per
+          cell; bit value-1 is set if value is still possible for that cell
+    cell: a list of lists (2 dimensional array) of Cell views onto values
+          and possibles, built the first time it is used
+    trail: None, or a list of (index, old candidate bitmask) entries, one per
+          change made to possibles, recorded while searching in place so
+          the changes can be undone back to a checkpoint
+    singles: a work queue of the flat indexes of cells whose candidates
+          have been reduced to exactly one value, waiting to be filled in
+    dead_end: True once some empty cell has had its last candidate removed
+    tables: the IndexTables shared by all puzzles of this size
+    counts: None, or for each unit (see IndexTables.units) a list of how
+          many of its cells hold each value (counts[unit][value]), built
+          the first time a cell is cleared or changed and then kept up to
+          date by set_cell, so later edits are cheap
+    nodes: the number of search nodes (values tried at branch points) in
+          the last solve() of this puzzle
+    stats: the SolveStats of the last solve() of this puzzle, if it was
+          asked to collect them, else None
     """
     def __init__(self, box_size=3):
         self.box_size = box_size
         self.max_val = box_size**2
         self.cells_filled = 0
-        self.cell = []
-        for row in range(self.max_val):
-            self.cell.append([])
-            for col in range(self.max_val):
-                new_cell = Cell(0, self.max_val)
-                self.cell[row].append(new_cell)
+        self.all_possible = (1 << self.max_val) - 1
+        self.values = [0] * self.max_val**2
+        self.possibles = [self.all_possible] * self.max_val**2
+        self._cell = None
+        self.trail = None
+        self.singles = []
+        self.dead_end = False
+        self.tables = index_tables(box_size)
+        self.counts = None
+        self.nodes = 0
+        self.stats = None
+
+    @property
+    def cell(self):
+        if self._cell is None:
+            self._cell = [[Cell(self, row*self.max_val + col) for col in range(self.max_val)]
+                          for row in range(self.max_val)]
+        return self._cell
+
+    def copy(self):
+        """Return an independent copy of this puzzle.  Only the flat value
+        and candidate arrays are copied; Cell views are rebuilt on demand."""
+        other = Sudoku.__new__(Sudoku)
+        other.box_size = self.box_size
+        other.max_val = self.max_val
+        other.cells_filled = self.cells_filled
+        other.all_possible = self.all_possible
+        other.values = self.values[:]
+        other.possibles = self.possibles[:]
+        other._cell = None
+        other.trail = None
+        other.singles = self.singles[:]
+        other.dead_end = self.dead_end
+        other.tables = self.tables
+        other.counts = None
+        other.nodes = 0
+        other.stats = None
+        return other
+
+    def __deepcopy__(self, memo):
+        return self.copy()
 
     def __str__(self):
         result = []
-        for row in self.cell:
-            for cell in row:
-                result.append(str(cell)+' ')
+        for row in range(self.max_val):
+            start = row*self.max_val
+            for value in self.values[start:start+self.max_val]:
+                result.append(value2char(value)+' ')
             result.append('\n')
         return ''.join(result)
 
@@ -86,11 +270,7 @@ class Sudoku(object):
             return False
         if self.cells_filled != other.cells_filled:
             return False
-        for row in range(self.max_val):
-            for col in range(self.max_val):
-                if self.cell[row][col].value != other.cell[row][col].value:
-                    return False
-        return True
+        return self.values == other.values
 
     def __ne__(self, other):
         return not Sudoku.__eq__(self, other)
@@ -115,11 +295,11 @@ class Sudoku(object):
 
     def char2value(self, c):
         """Given a character c, return the integer to use in setting that
-        cell's value.  Empty cells are denoted by '_', '-', '0', or ' ' and the
-        value 0 is returned.  Otherwise, possible cell values are 1-9, A-Z (for
+        cell's value.  Empty cells are denoted by '_', '-', '.', '0', or ' ' and
+        the value 0 is returned.  Otherwise, possible cell values are 1-9, A-Z (for
         10-35), a-z (for 36-61), '{' for 62, '|' for 63, '}' for 64.  If c is
         not any of these characters, return max_val+1."""
-        if c in ['_','-',' ','0']:
+        if c in ['_','-',' ','0','.']:
             return 0
         if c.isnumeric():
             return int(c)
@@ -129,109 +309,949 @@ class Sudoku(object):
             return 36 + ord(c) - ord('a')
         return self.max_val + 1
 
+    def to_string(self):
+        """Return the puzzle as a single line of one character per cell,
+        row by row, with '-' for empty cells"""
+        return values2string(self.values)
+
+    @classmethod
+    def from_string(cls, text):
+        """Return a new puzzle from a single line of one character per cell,
+        row by row, as written by to_string.  The puzzle size is taken from
+        the length of the line.  Raise ValueError if the line is not a
+        puzzle or a cell cannot be set to its value."""
+        box_size = int(round(len(text) ** 0.25))
+        if box_size < 1 or box_size**4 != len(text):
+            raise ValueError('A puzzle of %d cells is not square' % len(text))
+        puzzle = cls(box_size)
+        for index, c in enumerate(text):
+            value = puzzle.char2value(c)
+            if value != 0 and not puzzle.set_cell(value, *divmod(index, puzzle.max_val)):
+                row, col = divmod(index, puzzle.max_val)
+                raise ValueError('Row %d Column %d: Cannot set that cell to %s' % (row+1, col+1, c))
+        return puzzle
+
     def set_cell(self, value, row, col):
         """Check cell[row][col] to see if it can possibly be set to the
         supplied value. If not, return False.  If so, set it to
         that value and remove that value from the possible values in that
         row, column and box, and return True."""
-        if value not in self.cell[row][col].possible:
+        index = row*self.max_val + col
+        if value < 1 or not self.possibles[index] & value2bit(value):
             return False
         else:
-            self.cell[row][col].set(value)
+            if self.trail is not None:
+                self.trail.append((index, self.possibles[index]))
+            self.values[index] = value
+            self.possibles[index] = 0
             self.cells_filled += 1
+            if self.counts is not None:
+                for unit in self.tables.cell_units[index]:
+                    self.counts[unit][value] += 1
             self.remove_value_from_possibles(value, row, col)
             return True
 
+    def unit_counts(self):
+        """Return counts (see the class description), building it from
+        the cell values if there is none yet"""
+        if self.counts is None:
+            self.counts = [[0] * (self.max_val+1) for unit in self.tables.units]
+            for index, value in enumerate(self.values):
+                if value:
+                    for unit in self.tables.cell_units[index]:
+                        self.counts[unit][value] += 1
+        return self.counts
+
+    def unset_cell(self, row, col):
+        """Clear cell[row][col], putting its value back among the possible
+        values of the cells in its row, column and box that have no other
+        cell with that value in any of their own units.  Candidates are
+        worked out from the values placed, so any removed by propagation
+        strategies come back too (they would be removed again by
+        propagate).  Only for puzzles being edited, not searched: the
+        change is not recorded on the trail.  Return the old value (0 if
+        the cell was already empty)."""
+        index = row*self.max_val + col
+        value = self.values[index]
+        if not value:
+            return 0
+        counts = self.unit_counts()
+        cell_units = self.tables.cell_units
+        values = self.values
+        possibles = self.possibles
+        bit = value2bit(value)
+        values[index] = 0
+        self.cells_filled -= 1
+        placed = 0
+        for unit in cell_units[index]:
+            counts[unit][value] -= 1
+            for v in range(1, self.max_val+1):
+                if counts[unit][v]:
+                    placed |= value2bit(v)
+        possibles[index] = self.all_possible & ~placed
+        changed = [index]
+        for i in self.tables.peers[index]:
+            if not values[i] and not possibles[i] & bit:
+                if not any(counts[u][value] for u in cell_units[i]):
+                    possibles[i] |= bit
+                    changed.append(i)
+        # Cells that got a value back are no longer singles or dead ends,
+        # unless they had none before and now have one
+        self.singles[:] = [i for i in self.singles if popcount(possibles[i]) == 1]
+        self.singles.extend(i for i in changed if popcount(possibles[i]) == 1)
+        if self.dead_end:
+            self.dead_end = any(not values[i] and not possibles[i] for i in range(len(values)))
+        return value
+
+    def change_cell(self, value, row, col):
+        """Change cell[row][col] to value (0 to clear it), whether or not
+        it already has a value.  Return True if done, or False (leaving the
+        cell as it was) if no other cell in its row, column or box may have
+        that value."""
+        old = self.unset_cell(row, col)
+        if value == 0 or self.set_cell(value, row, col):
+            return True
+        if old:
+            self.set_cell(old, row, col)
+        return False
+
     def remove_value_from_possibles(self, value, row, col):
-        # First remove this value from the possible cell values in this row
-        for c in range(self.max_val):
-            self.cell[row][c].remove_from_possible(value)
-        # Next remove this value from the possible cell values in this column
-        for r in range(self.max_val):
-            self.cell[r][col].remove_from_possible(value)
-        # Finally, remove this value from the possible cell values in this box
-        # First, find the upper left corner of the box containing this cell
-        box_row = row // self.box_size * self.box_size
-        box_col = col // self.box_size * self.box_size
-        for r in range(box_row, box_row+self.box_size):
-            for c in range(box_col, box_col+self.box_size):
-                self.cell[r][c].remove_from_possible(value)
+        """Remove value from the possible values of every peer of
+        cell[row][col]: the other cells in its row, column and box"""
+        self.remove_bits(value2bit(value), self.tables.peers[row*self.max_val + col])
+
+    def remove_bits(self, bits, indexes):
+        """Clear the candidate bits in bits from the cells at the given flat
+        indexes, recording each cell actually changed on the trail (if
+        recording).  A cell left with one candidate is queued on singles; a
+        cell left with none means a dead end has been reached.
+        Return True if any cell was changed."""
+        possibles = self.possibles
+        trail = self.trail
+        keep = ~bits
+        changed = False
+        for i in indexes:
+            mask = possibles[i]
+            if mask & bits:
+                if trail is not None:
+                    trail.append((i, mask))
+                changed = True
+                mask &= keep
+                possibles[i] = mask
+                if not mask & (mask-1):
+                    if mask:
+                        self.singles.append(i)
+                    else:
+                        self.dead_end = True
+        return changed
+
+    def checkpoint(self):
+        """Return a marker for the current position in the trail, to be
+        passed to undo() later"""
+        return len(self.trail)
+
+    def undo(self, checkpoint):
+        """Undo every change recorded on the trail since checkpoint.  A cell
+        placement is recorded as the last change to its cell (a set cell has
+        no candidates left to remove), so when an entry is popped for a cell
+        that has a value, that value is the placement being undone.
+        Checkpoints are only taken once propagation has finished without a
+        dead end, so the singles queue is emptied and dead_end cleared."""
+        trail = self.trail
+        values = self.values
+        possibles = self.possibles
+        while len(trail) > checkpoint:
+            index, mask = trail.pop()
+            if values[index]:
+                values[index] = 0
+                self.cells_filled -= 1
+            possibles[index] = mask
+        del self.singles[:]
+        self.dead_end = False
 
     def find_one_possible(self):
         """Search all cells and return the row & column of the first cell
         found which only has one possible value.  If none, return None"""
-        for row in range(self.max_val):
-            for col in range(self.max_val):
-                if len(self.cell[row][col].possible) == 1:
-                    return (row, col)
+        for index, mask in enumerate(self.possibles):
+            if mask and not mask & (mask-1):
+                return divmod(index, self.max_val)
         return (None, None)
 
     def find_lowest_possibles(self):
         """Search all cells and return the row & column of the empty cell which
         has the lowest number of possible values"""
-        low_row = -1
-        low_col = -1
+        low_index = -1
         low_poss = self.max_val + 1
-        for row in range(self.max_val):
-            for col in range(self.max_val):
-                len_possible = len(self.cell[row][col].possible)
-                if len_possible > 0 and len_possible < low_poss:
-                    low_row = row
-                    low_col = col
+        for index, mask in enumerate(self.possibles):
+            if mask:
+                len_possible = popcount(mask)
+                if len_possible < low_poss:
+                    low_index = index
+                    low_poss = len_possible
+        if low_index < 0:
+            return (-1, -1)
+        return divmod(low_index, self.max_val)
+
+    def find_branch_cell(self, tie_break='first', rnd=None):
+        """Return the (row, col) of an empty cell with the fewest possible
+        values (MRV), or (-1, -1) if there is none.  Ties are broken by
+        tie_break: 'first' takes the first in row by row order (as
+        find_lowest_possibles does), 'degree' the one with the most empty
+        peers (the one constraining the most other cells), and 'random'
+        one chosen at random with rnd (a random.Random)."""
+        if tie_break == 'first':
+            return self.find_lowest_possibles()
+        low_poss = self.max_val + 1
+        ties = []
+        for index, mask in enumerate(self.possibles):
+            if mask:
+                len_possible = popcount(mask)
+                if len_possible < low_poss:
                     low_poss = len_possible
-        return (low_row, low_col)
+                    ties = [index]
+                elif len_possible == low_poss:
+                    ties.append(index)
+        if not ties:
+            return (-1, -1)
+        if tie_break == 'degree':
+            values = self.values
+            peers = self.tables.peers
+            index = max(ties, key=lambda i: sum(1 for p in peers[i] if not values[p]))
+        else:
+            index = rnd.choice(ties)
+        return divmod(index, self.max_val)
+
+    def pick_value(self, index, untried, order='lowest', rnd=None):
+        """Return the candidate bit, from the untried bitmask, of the next
+        value to try in the cell at flat index.  order is 'lowest' for the
+        lowest value first, 'lcv' for the least constraining value first
+        (the one possible in the fewest peers, so it rules out the fewest
+        candidates) or 'random' for a random one, chosen with rnd."""
+        if order == 'lowest':
+            return lowest_bit(untried)
+        if order == 'random':
+            return value2bit(rnd.choice(mask2values(untried)))
+        possibles = self.possibles
+        peers = self.tables.peers[index]
+        best = best_cost = None
+        while untried:
+            bit = untried & -untried
+            untried ^= bit
+            cost = sum(1 for p in peers if possibles[p] & bit)
+            if best is None or cost < best_cost:
+                best, best_cost = bit, cost
+        return best
 
     def fill_in_all_knowns(self):
-        """Keep searching through all cells, filling in all cells that
-        only have one possible value, until there are no more. When done,
-        the puzzle will either be done or there will be choices to be made
-        in cells with more than one possible value."""
-        row, col = self.find_one_possible()
-        while(row != None):
-            value = self.cell[row][col].possible[0]
-            self.set_cell(value, row, col)
-            row, col = self.find_one_possible()
+        """Keep filling in the cells queued on singles (cells that only
+        have one possible value), each of which may queue more, until there
+        are no more or a dead end is reached. When done, the puzzle will
+        either be done or there will be choices to be made in cells with
+        more than one possible value."""
+        singles = self.singles
+        possibles = self.possibles
+        while singles and not self.dead_end:
+            index = singles.pop()
+            mask = possibles[index]
+            if mask and not mask & (mask-1): # Not filled in, and still one value
+                row, col = divmod(index, self.max_val)
+                self.set_cell(bit2value(mask), row, col)
+
+    def hidden_singles(self):
+        """For each unit (row, column or box), find the values that are
+        possible in only one of its cells and remove every other candidate
+        from that cell, so it is filled in as a single.  A value that is
+        neither placed in a unit nor possible in any of its cells is a dead
+        end.  Return True if any progress was made."""
+        possibles = self.possibles
+        values = self.values
+        changed = False
+        for unit in self.tables.units:
+            once = twice = placed = 0
+            for i in unit:
+                mask = possibles[i]
+                twice |= once & mask
+                once |= mask
+                if values[i]:
+                    placed |= value2bit(values[i])
+            if once | placed != self.all_possible:
+                self.dead_end = True
+                return True
+            hidden = once & ~twice
+            while hidden:
+                bit = lowest_bit(hidden)
+                hidden ^= bit
+                for i in unit:
+                    if possibles[i] & bit:
+                        if self.remove_bits(possibles[i] ^ bit, (i,)):
+                            changed = True
+                        break
+                else: # An earlier hidden single in this unit took its cell
+                    self.dead_end = True
+                    return True
+        return changed
+
+    def naked_subsets(self, size):
+        """For each unit, find size cells whose candidates together hold
+        only size values.  Those values must go in those cells, so remove
+        them from every other cell of the unit.  Return True if any
+        candidate was removed."""
+        possibles = self.possibles
+        changed = False
+        for unit in self.tables.units:
+            cells = [i for i in unit if 1 < popcount(possibles[i]) <= size]
+            for subset in itertools.combinations(cells, size):
+                bits = 0
+                for i in subset:
+                    bits |= possibles[i]
+                if popcount(bits) == size:
+                    others = [i for i in unit if i not in subset]
+                    if self.remove_bits(bits, others):
+                        changed = True
+        return changed
+
+    def hidden_subsets(self, size):
+        """For each unit, find size values that are only possible in the
+        same size cells.  Those cells must hold those values, so remove
+        every other candidate from them.  Return True if any candidate was
+        removed."""
+        possibles = self.possibles
+        changed = False
+        for unit in self.tables.units:
+            places = {} # Candidate bit -> bitmask of positions in the unit
+            for pos, i in enumerate(unit):
+                mask = possibles[i]
+                while mask:
+                    bit = lowest_bit(mask)
+                    mask ^= bit
+                    places[bit] = places.get(bit, 0) | (1 << pos)
+            bits = [bit for bit in places if 1 < popcount(places[bit]) <= size]
+            for subset in itertools.combinations(bits, size):
+                where = 0
+                for bit in subset:
+                    where |= places[bit]
+                if popcount(where) == size:
+                    keep = sum(subset)
+                    cells = [unit[pos] for pos in range(len(unit)) if where >> pos & 1]
+                    if self.remove_bits(self.all_possible & ~keep, cells):
+                        changed = True
+                        break # places is out of date for this unit now
+        return changed
+
+    def naked_pairs(self):
+        return self.naked_subsets(2)
+
+    def naked_triples(self):
+        return self.naked_subsets(3)
+
+    def hidden_pairs(self):
+        return self.hidden_subsets(2)
+
+    def hidden_triples(self):
+        return self.hidden_subsets(3)
+
+    def box_line_reduction(self, pointing=True, claiming=True):
+        """For each box and each row or column crossing it, look at the
+        values possible in the cells they share.  Pointing: a value the box
+        can only hold in those cells is removed from the rest of the line.
+        Claiming (box/line): a value the line can only hold in those cells
+        is removed from the rest of the box.  Return True if any candidate
+        was removed."""
+        possibles = self.possibles
+        changed = False
+        for overlap, box_rest, line_rest in self.tables.intersections:
+            overlap_bits = 0
+            for i in overlap:
+                overlap_bits |= possibles[i]
+            if not overlap_bits:
+                continue
+            box_bits = line_bits = 0
+            for i in box_rest:
+                box_bits |= possibles[i]
+            for i in line_rest:
+                line_bits |= possibles[i]
+            if pointing:
+                bits = overlap_bits & line_bits & ~box_bits
+                if bits and self.remove_bits(bits, line_rest):
+                    changed = True
+            if claiming:
+                bits = overlap_bits & box_bits & ~line_bits
+                if bits and self.remove_bits(bits, box_rest):
+                    changed = True
+        return changed
+
+    def pointing_pairs(self):
+        return self.box_line_reduction(True, False)
+
+    def box_line(self):
+        return self.box_line_reduction(False, True)
+
+    def propagate(self, strategies=(), stats=None):
+        """Fill in all known cells, then run each strategy in turn (each a
+        function taking this puzzle and returning True if it made progress).
+        As soon as one makes progress go back to filling in known cells, and
+        stop once no strategy can make progress, the puzzle is solved or a
+        dead end is reached.  Progress is counted in stats (a SolveStats
+        object) if it is not None."""
+        if stats is not None:
+            start = time.perf_counter()
+            filled = self.cells_filled
+        while True:
+            self.fill_in_all_knowns()
+            if self.dead_end or self.solved():
+                break
+            for strategy in strategies:
+                progress = strategy(self)
+                if stats is not None:
+                    stats.strategy_run(strategy, progress)
+                if progress:
+                    break
+            else:
+                break
+        if stats is not None:
+            stats.seconds['propagate'] += time.perf_counter() - start
+            stats.propagations += 1
+            stats.placements += self.cells_filled - filled
+            if stats.on_propagate is not None:
+                stats.on_propagate(self, self.cells_filled - filled)
 
     def reached_dead_end(self):
         """Return True if a dead end has been reached in filling out this
         puzzle, False if there are still possible moves.  A dead end is
         reached when there is at least one valueless cell that has no
         possible values to put in it."""
-        for r in range(self.max_val):
-            for c in range(self.max_val):
-                if self.cell[r][c].value==0 and len(self.cell[r][c].possible)==0:
-                    return True
-        return False
+        return self.dead_end
 
     def solved(self):
         """Return True if the puzzle is solved (i.e. all cells have values),
         False if there are still empty cells."""
-        for r in range(self.max_val):
-            for c in range(self.max_val):
-                if self.cell[r][c].value==0:
-                    return False
-        return True
+        return self.cells_filled == self.max_val**2
+
+    def solve(self, backtrack='trail', strategies=None, engine=None, stats=None,
+              timeout=None, max_nodes=None, heuristic=None, seed=None, restart_nodes=None):
+        """Return a solved copy of this puzzle, or None if it has no
+        solution.  backtrack selects how the search returns to a branch
+        point: 'trail' (the default) changes one copy of the puzzle in place
+        and undoes changes from its trail, 'copy' keeps a full copy of the
+        puzzle for every untried value.  strategies lists the propagation
+        strategies (names from STRATEGIES, or functions taking the puzzle)
+        run before each branch, in order; None means DEFAULT_STRATEGIES and
+        an empty list means naked singles only.  engine is 'search' for the
+        candidate search above or 'dlx' for the Dancing Links exact cover
+        solver; None picks the engine for this box_size from ENGINES.
+        stats is a SolveStats object to fill in (or True for a new one),
+        left in self.stats afterwards; None (the default) collects nothing.
+        timeout (seconds) and max_nodes limit the search: if either is
+        reached first SolveLimitReached is raised, holding the SearchState
+        to carry on from.  heuristic names how the search picks branch
+        cells and the order to try their values (see HEURISTICS; None means
+        'mrv'), and seed seeds the 'random' heuristic.  If restart_nodes is
+        given (with the 'random' heuristic only) the search starts again
+        with a new seed after that many nodes (a positive integer), doubling
+        it each restart.  Limits, heuristics and restarts need the 'search' engine with
+        'trail' backtracking, which is then the default whatever the
+        box_size."""
+        strategies = find_strategies(strategies)
+        if heuristic is not None and heuristic not in HEURISTICS:
+            raise ValueError('Unknown heuristic: ' + str(heuristic))
+        if restart_nodes is not None and heuristic != 'random':
+            raise ValueError('restart_nodes needs the random heuristic')
+        if restart_nodes is not None and (not isinstance(restart_nodes, int) or
+                                          isinstance(restart_nodes, bool) or restart_nodes < 1):
+            raise ValueError('restart_nodes must be a positive integer, not ' + repr(restart_nodes))
+        limited = timeout is not None or max_nodes is not None or restart_nodes is not None
+        custom = limited or heuristic not in (None, 'mrv')
+        if engine is None:
+            engine = 'search' if custom else ENGINES.get(self.box_size, 'search')
+        if custom and (engine != 'search' or backtrack != 'trail'):
+            raise ValueError('timeout, max_nodes, heuristic and restart_nodes need the search engine '
+                             'with trail backtracking')
+        heuristic = heuristic or 'mrv'
+        if engine not in ('search', 'dlx'):
+            raise ValueError('Unknown engine: ' + str(engine))
+        if backtrack not in ('trail', 'copy'):
+            raise ValueError('Unknown backtrack mode: ' + str(backtrack))
+        if stats is True:
+            stats = SolveStats()
+        self.stats = stats
+        if stats is not None:
+            start = time.perf_counter()
+        try:
+            if limited:
+                solution = self.solve_limited(strategies, stats, timeout, max_nodes,
+                                              heuristic, seed, restart_nodes)
+            elif engine == 'dlx':
+                solution = self.solve_exact_cover(strategies, stats)
+            elif backtrack == 'trail':
+                solution = self.solve_in_place(strategies, stats, heuristic, seed)
+            else:
+                solution = self.solve_by_copying(strategies, stats)
+        finally:
+            if stats is not None:
+                stats.seconds['total'] += time.perf_counter() - start
+                stats.nodes += self.nodes
+        return solution
 
-    def solve(self):
+    def solve_by_copying(self, strategies=(), stats=None):
+        """Depth-first search keeping a copy of the puzzle for every value
+        not yet tried on a stack of puzzles."""
+        self.nodes = 0
         puzzles = []
-        puzzles.append(copy.deepcopy(self))
+        start = self.copy()
+        puzzles.append(start)
         while(len(puzzles)):
             puzzle = puzzles.pop()
-            puzzle.fill_in_all_knowns()
+            if puzzle is not start:
+                self.nodes += 1 # A value tried at a branch point
+            puzzle.propagate(strategies, stats)
             if puzzle.solved():
                 puzzles = []
             elif puzzle.reached_dead_end() and len(puzzles)==0:
                 puzzle = None #No solution was found
+                if stats is not None:
+                    stats.dead_ends += 1
             elif puzzle.reached_dead_end():
+                if stats is not None:
+                    stats.dead_ends += 1
+                    stats.backtracks += 1
+                    if stats.on_backtrack is not None:
+                        stats.on_backtrack(puzzles[-1], len(puzzles))
                 continue
             else:
                 row, col = puzzle.find_lowest_possibles()
-                for value in puzzle.cell[row][col].possible:
-                    forked_puzzle = copy.deepcopy(puzzle)
+                values = mask2values(puzzle.possibles[row*puzzle.max_val + col])
+                if stats is not None:
+                    stats.branched(puzzle, row, col, values, len(puzzles)+1)
+                for value in values:
+                    forked_puzzle = puzzle.copy()
                     forked_puzzle.set_cell(value, row, col)
                     puzzles.append(forked_puzzle)
+                if stats is not None:
+                    stats.copies += len(values)
+                    stats.max_stack = max(stats.max_stack, len(puzzles))
         return puzzle
 
+    def solve_exact_cover(self, strategies=(), stats=None):
+        """Propagate with the given strategies, then solve what is left as
+        an exact cover problem with Dancing Links (see sudokuDlx.py)."""
+        from sudokuDlx import exact_cover_solve
+        self.nodes = 0
+        puzzle = self.copy()
+        puzzle.propagate(strategies, stats)
+        if puzzle.dead_end:
+            return None
+        if puzzle.solved():
+            return puzzle
+        if stats is not None:
+            start = time.perf_counter()
+        values, self.nodes = exact_cover_solve(puzzle.box_size, puzzle.values, puzzle.possibles)
+        if stats is not None:
+            stats.seconds['search'] += time.perf_counter() - start
+        if values is None:
+            return None
+        for index, value in enumerate(values):
+            if puzzle.values[index]==0:
+                puzzle.set_cell(value, *divmod(index, puzzle.max_val))
+        return puzzle
+
+    def solve_in_place(self, strategies=(), stats=None, heuristic='mrv', seed=None):
+        """Return the first solution found by search_in_place, or None"""
+        for puzzle in self.search_in_place(strategies, stats, heuristic, seed):
+            puzzle.trail = None
+            return puzzle
+        return None
+
+    def count_solutions(self, limit=None, strategies=None, stats=None):
+        """Return the number of solutions this puzzle has, counting no
+        further than limit (None for no limit) so the search stops as soon
+        as limit solutions are found.  strategies and stats are as for
+        solve()."""
+        strategies = find_strategies(strategies)
+        if stats is True:
+            stats = SolveStats()
+        self.stats = stats
+        count = 0
+        if limit is not None and limit <= 0:
+            return count
+        if stats is not None:
+            start = time.perf_counter()
+        try:
+            for puzzle in self.search_in_place(strategies, stats):
+                count += 1
+                if count == limit:
+                    break
+        finally:
+            if stats is not None:
+                stats.seconds['total'] += time.perf_counter() - start
+                stats.nodes += self.nodes
+        return count
+
+    def is_unique(self, strategies=None, stats=None):
+        """Return True if this puzzle has exactly one solution"""
+        return self.count_solutions(2, strategies, stats) == 1
+
+    def search_in_place(self, strategies=(), stats=None, heuristic='mrv', seed=None):
+        """Depth-first search on a single copy of this puzzle, yielding
+        that copy each time it is solved; the search carries on from there
+        if asked for the next solution, so copy a solution to keep it.  See
+        SearchState."""
+        state = SearchState(self, strategies, stats, heuristic, seed)
+        while state.run() == 'solved':
+            yield state.puzzle
+
+    def solve_limited(self, strategies=(), stats=None, timeout=None, max_nodes=None,
+                      heuristic='mrv', seed=None, restart_nodes=None):
+        """Search as search_in_place does for at most timeout seconds and
+        max_nodes nodes in all (None for no limit), restarting with a new
+        seed after restart_nodes nodes (doubled each restart) if it is not
+        None.  Return the solution, or None if there is none; raise
+        SolveLimitReached, holding the SearchState to carry on from, if a
+        limit is reached first."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        rnd = random.Random(seed)
+        nodes = 0
+        while True:
+            if restart_nodes is not None:
+                seed = rnd.getrandbits(64)
+            state = SearchState(self, strategies, stats, heuristic, seed)
+            budget = None if max_nodes is None else max_nodes - nodes
+            if restart_nodes is not None and (budget is None or restart_nodes < budget):
+                status = state.run(restart_nodes, deadline)
+                restarting = status == 'paused' and \
+                    (deadline is None or time.perf_counter() < deadline)
+            else:
+                status = state.run(budget, deadline)
+                restarting = False
+            nodes += state.nodes
+            self.nodes = nodes
+            if not restarting:
+                break
+            restart_nodes *= 2
+        if status == 'paused':
+            raise SolveLimitReached(state)
+        solution = state.solution()
+        if solution is not None:
+            solution.nodes = nodes
+        return solution
+
+    def solve_iter(self, slice_nodes=1000, strategies=None, stats=None, state=None):
+        """Search in slices of at most slice_nodes nodes, yielding the
+        SearchState after each slice so the caller can do other work, check
+        a deadline or save the state between slices; simply stop iterating
+        to pause.  The last state yielded has status 'solved' (its
+        solution() is the solution) or 'done' (there is no solution).
+        To resume a search pass state: a SearchState, or a dictionary saved
+        from one by as_dict (strategies are then taken from the state).
+        stats, if not None, is filled in from here on, in place of any
+        stats the SearchState was filling in.  Raise ValueError straight
+        away unless slice_nodes is a positive integer."""
+        if not isinstance(slice_nodes, int) or isinstance(slice_nodes, bool) or slice_nodes < 1:
+            raise ValueError('slice_nodes must be a positive integer, not ' + repr(slice_nodes))
+        if state is None:
+            state = SearchState(self, find_strategies(strategies), stats)
+        elif isinstance(state, dict):
+            state = SearchState.from_dict(state, stats)
+        elif stats is not None:
+            state.stats = stats
+        def slices():
+            while True:
+                status = state.run(slice_nodes)
+                yield state
+                if status != 'paused':
+                    return
+        return slices()
+
+class SearchState(object):
+    """The state of a depth-first search on a single copy of a puzzle,
+    which can be run a slice at a time and saved and restored between
+    slices.  Each branch point remembers the trail checkpoint taken before
+    its first value was tried and the values not yet tried; backtracking
+    undoes the trail back to that checkpoint instead of discarding a copy
+    of the puzzle.  Everything is plain lists and integers, so as_dict()
+    can be written out as JSON.
+    Attributes:
+    puzzle: the copy of the puzzle being searched, with a trail
+    strategies: the propagation strategies run before each branch
+    stats: a SolveStats object to fill in, or None
+    branches: a list of [checkpoint, row, col, untried candidate bitmask],
+          one per open branch point
+    nodes: the number of search nodes (values tried at branch points)
+    status: 'searching', 'paused' (a limit was reached), 'solved' (puzzle
+          is solved; running again carries on to the next solution) or
+          'done' (there are no more solutions)
+    owner: the puzzle the search was started from, whose nodes count is
+          kept up to date while searching (None for a restored search)
+    heuristic: the name of the branching heuristic (see HEURISTICS)
+    random: the random.Random used by the 'random' heuristic, else None
+    """
+    def __init__(self, puzzle, strategies=(), stats=None, heuristic='mrv', seed=None):
+        if heuristic not in HEURISTICS:
+            raise ValueError('Unknown heuristic: ' + str(heuristic))
+        self.heuristic = heuristic
+        self.tie_break, self.value_order = HEURISTICS[heuristic]
+        self.random = random.Random(seed) if 'random' in HEURISTICS[heuristic] else None
+        self.owner = puzzle
+        puzzle.nodes = 0
+        self.puzzle = puzzle.copy()
+        self.puzzle.trail = []
+        self.strategies = strategies
+        self.stats = stats
+        self.branches = []
+        self.nodes = 0
+        self.status = 'searching'
+        self.advance = False # True if the next step is to try the next value
+
+    def solution(self):
+        """Return a copy of the solution, or None if not solved"""
+        if self.status != 'solved':
+            return None
+        solution = self.puzzle.copy()
+        solution.nodes = self.nodes
+        return solution
+
+    def run(self, max_nodes=None, deadline=None):
+        """Search until a solution is found, there are no more solutions,
+        max_nodes more nodes have been tried or time.perf_counter() passes
+        deadline (None for no limit), and return the new status"""
+        puzzle = self.puzzle
+        stats = self.stats
+        branches = self.branches
+        limit = None if max_nodes is None else self.nodes + max_nodes
+        while True:
+            if not self.advance:
+                puzzle.propagate(self.strategies, stats)
+                self.advance = True
+                if puzzle.solved():
+                    self.status = 'solved'
+                    return self.status
+                elif not puzzle.reached_dead_end():
+                    if stats is not None:
+                        start = time.perf_counter()
+                    row, col = puzzle.find_branch_cell(self.tie_break, self.random)
+                    untried = puzzle.possibles[row*puzzle.max_val + col]
+                    branches.append([puzzle.checkpoint(), row, col, untried])
+                    if stats is not None:
+                        stats.seconds['branch'] += time.perf_counter() - start
+                        stats.branched(puzzle, row, col, mask2values(untried), len(branches))
+                elif stats is not None:
+                    stats.dead_ends += 1
+            # Try the next value at the innermost branch point that has one
+            while branches and not branches[-1][3]:
+                branches.pop()
+            if not branches:
+                self.status = 'done' # No more solutions
+                return self.status
+            if (limit is not None and self.nodes >= limit) or \
+               (deadline is not None and time.perf_counter() >= deadline):
+                self.status = 'paused'
+                return self.status
+            checkpoint, row, col, untried = branches[-1]
+            if stats is None:
+                puzzle.undo(checkpoint)
+            elif puzzle.checkpoint() != checkpoint:
+                start = time.perf_counter()
+                puzzle.undo(checkpoint)
+                stats.seconds['backtrack'] += time.perf_counter() - start
+                stats.backtracks += 1
+                if stats.on_backtrack is not None:
+                    stats.on_backtrack(puzzle, len(branches))
+            bit = puzzle.pick_value(row*puzzle.max_val + col, untried, self.value_order, self.random)
+            branches[-1][3] = untried ^ bit
+            puzzle.set_cell(bit2value(bit), row, col)
+            self.advance = False
+            self.status = 'searching'
+            self.nodes += 1
+            if self.owner is not None:
+                self.owner.nodes += 1
+
+    def as_dict(self):
+        """Return the state as a dictionary of plain lists and numbers,
+        suitable for saving as JSON and restoring with from_dict.  The
+        strategies must be ones named in STRATEGIES."""
+        names = {function: name for name, function in STRATEGIES.items()}
+        try:
+            strategies = [names[strategy] for strategy in self.strategies]
+        except KeyError:
+            raise ValueError('Only strategies named in STRATEGIES can be saved')
+        random_state = None
+        if self.random is not None:
+            version, internal, gauss = self.random.getstate()
+            random_state = [version, list(internal), gauss]
+        puzzle = self.puzzle
+        return {
+            'box_size': puzzle.box_size,
+            'values': puzzle.values[:],
+            'possibles': puzzle.possibles[:],
+            'cells_filled': puzzle.cells_filled,
+            'singles': puzzle.singles[:],
+            'dead_end': puzzle.dead_end,
+            'trail': [list(entry) for entry in puzzle.trail],
+            'branches': [branch[:] for branch in self.branches],
+            'nodes': self.nodes,
+            'status': self.status,
+            'advance': self.advance,
+            'strategies': strategies,
+            'heuristic': self.heuristic,
+            'random_state': random_state,
+        }
+
+    @classmethod
+    def from_dict(cls, data, stats=None):
+        """Return a SearchState restored from a dictionary made by
+        as_dict, filling in stats (a SolveStats object) if not None"""
+        puzzle = Sudoku(data['box_size'])
+        puzzle.values = list(data['values'])
+        puzzle.possibles = list(data['possibles'])
+        puzzle.cells_filled = data['cells_filled']
+        puzzle.singles = list(data['singles'])
+        puzzle.dead_end = data['dead_end']
+        state = cls(puzzle, find_strategies(data['strategies']), stats, data.get('heuristic', 'mrv'))
+        if data.get('random_state') is not None:
+            version, internal, gauss = data['random_state']
+            state.random.setstate((version, tuple(internal), gauss))
+        state.owner = None
+        state.puzzle.trail = [tuple(entry) for entry in data['trail']]
+        state.branches = [list(branch) for branch in data['branches']]
+        state.nodes = data['nodes']
+        state.status = data['status']
+        state.advance = data['advance']
+        return state
+
+class SolveCancelled(Exception):
+    """Raised by a SolveStats hook to stop a search part way through;
+    it is passed on to the caller of solve (or count_solutions)"""
+    pass
+
+class SolveLimitReached(SolveCancelled):
+    """Raised by Sudoku.solve when its timeout or max_nodes is reached
+    before the search finishes.
+    Attributes:
+    state: the SearchState of the search, which can be run again (or saved
+          with as_dict) to carry on where it stopped
+    """
+    def __init__(self, state):
+        SolveCancelled.__init__(self, 'Search stopped after %d nodes' % state.nodes)
+        self.state = state
+
+class SolveStats(object):
+    """Statistics about one or more runs of Sudoku.solve, and hooks called
+    while it searches.  Nothing is collected unless a SolveStats object is
+    passed to solve.  A hook can stop the search by raising SolveCancelled.
+    Attributes:
+    nodes: search nodes (see Sudoku.nodes)
+    branches: branch points (cells where values had to be guessed)
+    max_depth: the greatest number of branch points open at once
+    max_stack: the greatest number of puzzles waiting on the stack of
+          puzzles (backtrack='copy' only)
+    copies: copies of the puzzle made while searching (backtrack='copy' only)
+    propagations: calls of Sudoku.propagate
+    placements: cells filled in by propagation
+    strategy_calls: the number of times each strategy was run, by name
+    strategy_progress: the number of those runs that made progress, by name
+    dead_ends: dead ends reached
+    backtracks: returns to an earlier branch point after a dead end
+    seconds: wall clock time by phase: 'total', 'propagate', 'branch'
+          (choosing branch cells), 'backtrack' (undoing the trail) and
+          'search' (the dlx engine's search)
+    on_branch: None, or a function called as on_branch(puzzle, row, col,
+          values, depth) at each branch point
+    on_backtrack: None, or a function called as on_backtrack(puzzle, depth)
+          after returning to an earlier branch point
+    on_propagate: None, or a function called as on_propagate(puzzle, filled)
+          after each propagation, with the number of cells it filled in
+    """
+    def __init__(self, on_branch=None, on_backtrack=None, on_propagate=None):
+        self.nodes = 0
+        self.branches = 0
+        self.max_depth = 0
+        self.max_stack = 0
+        self.copies = 0
+        self.propagations = 0
+        self.placements = 0
+        self.strategy_calls = {}
+        self.strategy_progress = {}
+        self.dead_ends = 0
+        self.backtracks = 0
+        self.seconds = {'total': 0.0, 'propagate': 0.0, 'branch': 0.0, 'backtrack': 0.0, 'search': 0.0}
+        self.on_branch = on_branch
+        self.on_backtrack = on_backtrack
+        self.on_propagate = on_propagate
+
+    def __repr__(self):
+        return 'SolveStats(%r)' % self.as_dict()
+
+    def branched(self, puzzle, row, col, values, depth):
+        self.branches += 1
+        self.max_depth = max(self.max_depth, depth)
+        if self.on_branch is not None:
+            self.on_branch(puzzle, row, col, values, depth)
+
+    def strategy_run(self, strategy, progress):
+        name = getattr(strategy, '__name__', str(strategy))
+        self.strategy_calls[name] = self.strategy_calls.get(name, 0) + 1
+        if progress:
+            self.strategy_progress[name] = self.strategy_progress.get(name, 0) + 1
+
+    def as_dict(self):
+        """Return the statistics (not the hooks) as a dictionary, suitable
+        for logging as JSON"""
+        return {
+            'nodes': self.nodes,
+            'branches': self.branches,
+            'max_depth': self.max_depth,
+            'max_stack': self.max_stack,
+            'copies': self.copies,
+            'propagations': self.propagations,
+            'placements': self.placements,
+            'strategy_calls': dict(self.strategy_calls),
+            'strategy_progress': dict(self.strategy_progress),
+            'dead_ends': self.dead_ends,
+            'backtracks': self.backtracks,
+            'seconds': dict(self.seconds),
+        }
+
+# Propagation strategies that Sudoku.solve can run before branching, by name
+STRATEGIES = {
+    'hidden_singles': Sudoku.hidden_singles,
+    'naked_pairs': Sudoku.naked_pairs,
+    'naked_triples': Sudoku.naked_triples,
+    'hidden_pairs': Sudoku.hidden_pairs,
+    'hidden_triples': Sudoku.hidden_triples,
+    'pointing_pairs': Sudoku.pointing_pairs,
+    'box_line': Sudoku.box_line,
+}
+
+DEFAULT_STRATEGIES = ['hidden_singles', 'pointing_pairs', 'box_line']
+
+# Branching heuristics for the search engine, by name: how ties between the
+# cells with the fewest possible values are broken (see find_branch_cell)
+# and the order their values are tried in (see pick_value)
+HEURISTICS = {
+    'mrv': ('first', 'lowest'),
+    'degree': ('degree', 'lowest'),
+    'lcv': ('first', 'lcv'),
+    'degree-lcv': ('degree', 'lcv'),
+    'random': ('random', 'random'),
+}
+
+# Solver engine used by Sudoku.solve for each box_size ('search' if not listed)
+ENGINES = {4: 'dlx'}
+
+def find_strategies(strategies):
+    """Return a list of strategy functions for a list of strategy names
+    and/or functions (None for DEFAULT_STRATEGIES)"""
+    if strategies is None:
+        strategies = DEFAULT_STRATEGIES
+    result = []
+    for strategy in strategies:
+        if callable(strategy):
+            result.append(strategy)
+        elif strategy in STRATEGIES:
+            result.append(STRATEGIES[strategy])
+        else:
+            raise ValueError('Unknown strategy: ' + str(strategy))
+    return result
+
 class SudokuGui():
     """Creates and manages the GUI window for the Sudoku puzzle.
     Attributes:
@@ -239,6 +1259,8 @@ class SudokuGui():
     gui_frame = the frame containing all the widgets that make up the GUI window
     clear_button: a Tkinter widget for the clear button
     solve_button: a Tkinter widget for the solve button
+    cancel_button: a Tkinter widget for the cancel button (enabled only
+               while solving)
     canvas: a Tkinter canvas widget for displaying everything else
     x: x pixel coordinate for the upper left corner of the puzzle border
     y: y pixel coordinate for the upper left corner of the puzzle border
@@ -252,6 +1274,22 @@ class SudokuGui():
     sel_row: the row number of the selected cell (None if none is selected)
     sel_col: the column number of the selected cell (None if none is selected)
     error_message: a Tkinter item for the error message (a line of text)
+    progress_message: a Tkinter item for the progress of a solve (nodes
+               searched and time taken)
+    solver: the thread solving the puzzle (None if not solving)
+    solve_start: the time.perf_counter() time the solve started
+    solve_result: the solution found by the solver thread, None if there
+               is none, or a SolveCancelled exception if it was cancelled
+    cancel_requested: set to True to make the solver thread stop
+    undo_list: the edits made to the puzzle, as (row, col, old value, new
+               value), most recent last
+    redo_list: the edits undone, most recently undone last
+    check_state: the SearchState of the check run after each edit for
+               whether the puzzle can still be solved (None if none is
+               running); it runs a slice at a time between GUI events
+    check_message: a Tkinter item for the result of that check
+    showing_solution: True while the last solution is displayed in the
+               empty cells
     """
     def __init__(self, x=160, y=20, cell_pix=40, box_size=3):
         self.puzzle = Sudoku(box_size)
@@ -259,6 +1297,8 @@ class SudokuGui():
         self.gui_frame.pack(fill=BOTH,expand=1)
         self.clear_button = tkinter.Button(self.gui_frame,text="Clear",command=self.clear_pressed)
         self.clear_button.pack(side=TOP)
+        self.cancel_button = tkinter.Button(self.gui_frame,text="Cancel",command=self.cancel_pressed,state=DISABLED)
+        self.cancel_button.pack(side=BOTTOM)
         self.solve_button = tkinter.Button(self.gui_frame,text="Solve",command=self.solve_pressed)
         self.solve_button.pack(side=BOTTOM)
         self.canvas = tkinter.Canvas(self.gui_frame, bg='white', width=540, height=400)
@@ -266,6 +1306,8 @@ class SudokuGui():
         self.canvas.focus_set()
         self.canvas.bind('<ButtonPress-1>', self.process_click)
         self.canvas.bind('<Key>', self.check_key)
+        self.canvas.bind('<Control-z>', self.undo_pressed)
+        self.canvas.bind('<Control-y>', self.redo_pressed)
         self.x = x
         self.y = y
         self.xk = 20
@@ -275,6 +1317,14 @@ class SudokuGui():
         self.cell_vtag = []
         self.sel_row = None
         self.sel_col = None
+        self.solver = None
+        self.solve_start = None
+        self.solve_result = None
+        self.cancel_requested = False
+        self.undo_list = []
+        self.redo_list = []
+        self.check_state = None
+        self.showing_solution = False
         self.draw_puzzle_grid()
         self.draw_keypad()
         self.display_instructions()      
@@ -314,7 +1364,11 @@ class SudokuGui():
         self.canvas.create_text(80,50, text='Instructions')
         self.canvas.create_text(80,80, text='Click puzzle cell then')
         self.canvas.create_text(80,100, text='type or click value.')
+        self.canvas.create_text(80,120, text='0 or Delete clears it.')
+        self.canvas.create_text(80,150, text='Ctrl+Z undo, Ctrl+Y redo')
         self.error_message = self.canvas.create_text(80,300, text='', fill='red')
+        self.progress_message = self.canvas.create_text(80,320, text='')
+        self.check_message = self.canvas.create_text(80,340, text='')
 
     def process_click(self, event):
         """Given canvas pixels coordinates x and y, select the corresponding
@@ -322,6 +1376,8 @@ class SudokuGui():
         selected cell to the value clicked.  If both the puzzle and keypad were
         missed, deselect the previously selected cell."""
         self.clear_error_message()
+        if self.solver is not None:
+            return # The puzzle cannot be changed while it is being solved
         x = event.x
         y = event.y
         if x<self.x or x>=self.x+self.cell_pix*self.puzzle.max_val or y<self.y or y>=self.y+self.cell_pix*self.puzzle.max_val:
@@ -349,27 +1405,79 @@ class SudokuGui():
 
     def check_key(self, event):
         self.clear_error_message()
-        self.process_key(event.char)
+        if self.solver is None:
+            self.process_key(event.char)
 
     def process_key(self, char):
-        """Valid keys for 3x3 puzzle are 1-9
-        Will need to be expanded to support 4x4 and larger puzzles
-        Clearing or changing a previously set cell is difficult, as
-        when the cell was originally set that value was removed from
-        the possible list for all affected cells - so it would need
-        to be added back in! Implement only 'clear entire puzzle' for now."""
+        """Valid keys for 3x3 puzzle are 1-9 to set (or change) the selected
+        cell, and 0, space, Backspace or Delete to clear it.
+        Will need to be expanded to support 4x4 and larger puzzles"""
         if self.sel_row!=None:
-            if self.puzzle.cell[self.sel_row][self.sel_col].value!=0:
-                # User is trying to change a cell that already has a value
-                # Disallow for now, print error message
-                self.canvas.itemconfig(self.error_message, text='Cannot change cell')
+            if len(char) == 1 and char in '123456789':
+                value = int(char)
+            elif char in ('0', ' ', '\x08', '\x7f'):
+                value = 0
             else:
-                if char.isnumeric() and char!='0':
-                    value = int(char)
-                    if self.puzzle.set_cell(value, self.sel_row, self.sel_col):
-                        self.canvas.itemconfig(self.cell_vtag[self.sel_row][self.sel_col], text=char)
-                    else:
-                        self.canvas.itemconfig(self.error_message, text='Cannot set cell to '+char)
+                return
+            old = self.puzzle.values[self.sel_row*self.puzzle.max_val + self.sel_col]
+            if value != old:
+                if self.edit_cell(self.sel_row, self.sel_col, value):
+                    self.undo_list.append((self.sel_row, self.sel_col, old, value))
+                    del self.redo_list[:]
+                else:
+                    self.canvas.itemconfig(self.error_message, text='Cannot set cell to '+char)
+
+    def edit_cell(self, row, col, value):
+        """Change a cell of the puzzle (value 0 clears it) and its display,
+        then start checking whether the puzzle can still be solved.  Return
+        False if the cell cannot be set to that value."""
+        if not self.puzzle.change_cell(value, row, col):
+            return False
+        if self.showing_solution:
+            # The solution shown is of the puzzle before this edit
+            for r in range(self.puzzle.max_val):
+                for c in range(self.puzzle.max_val):
+                    if self.puzzle.values[r*self.puzzle.max_val + c] == 0:
+                        self.canvas.itemconfig(self.cell_vtag[r][c], text=' ', fill='black')
+            self.showing_solution = False
+        self.canvas.itemconfig(self.cell_vtag[row][col], text=value2char(value) if value else ' ', fill='black')
+        self.start_check()
+        return True
+
+    def undo_pressed(self, event=None):
+        self.clear_error_message()
+        if self.solver is None and self.undo_list:
+            row, col, old, new = self.undo_list.pop()
+            self.edit_cell(row, col, old)
+            self.redo_list.append((row, col, old, new))
+
+    def redo_pressed(self, event=None):
+        self.clear_error_message()
+        if self.solver is None and self.redo_list:
+            row, col, old, new = self.redo_list.pop()
+            self.edit_cell(row, col, new)
+            self.undo_list.append((row, col, old, new))
+
+    def start_check(self):
+        """Start checking whether the puzzle can still be solved, dropping
+        any check of an earlier version of it"""
+        self.check_state = SearchState(self.puzzle.copy(), find_strategies(None))
+        self.canvas.itemconfig(self.check_message, text='Checking...', fill='black')
+        self.canvas.after(1, self.continue_check, self.check_state)
+
+    def continue_check(self, state):
+        """Run a slice of the check, then let the GUI handle events before
+        the next slice"""
+        if state is not self.check_state:
+            return # The puzzle has changed since this check started
+        if state.run(200) == 'paused':
+            self.canvas.after(1, self.continue_check, state)
+            return
+        self.check_state = None
+        if state.status == 'solved':
+            self.canvas.itemconfig(self.check_message, text='Can be solved', fill='green')
+        else:
+            self.canvas.itemconfig(self.check_message, text='No solution', fill='red')
 
     def clear_error_message(self):
         self.canvas.itemconfig(self.error_message, text='')
@@ -377,6 +1485,14 @@ class SudokuGui():
     def clear_pressed(self):
         self.clear_error_message()
         self.deselect_cell()
+        if self.solver is not None:
+            return
+        self.canvas.itemconfig(self.progress_message, text='')
+        self.canvas.itemconfig(self.check_message, text='')
+        self.check_state = None
+        self.undo_list = []
+        self.redo_list = []
+        self.showing_solution = False
         box_size = self.puzzle.box_size
         self.puzzle = Sudoku(box_size)
         for row in range(self.puzzle.max_val):
@@ -384,17 +1500,67 @@ class SudokuGui():
                 self.canvas.itemconfig(self.cell_vtag[row][col], text=' ', fill='black')
 
     def solve_pressed(self):
+        """Start solving the puzzle in a background thread, so the window
+        keeps responding; poll_solver shows its progress and the result.
+        solve works on its own copy of the puzzle, which is left unchanged."""
         self.clear_error_message()
         self.deselect_cell()
-        puzzle_2solve = copy.deepcopy(self.puzzle)
-        solution = self.puzzle.solve()
-        if solution is None:
+        if self.solver is not None:
+            return
+        self.cancel_requested = False
+        self.check_state = None # The solve will tell whether it can be solved
+        self.canvas.itemconfig(self.check_message, text='')
+        self.solve_result = None
+        self.solve_start = time.perf_counter()
+        self.solver = threading.Thread(target=self.run_solver, daemon=True)
+        self.solver.start()
+        self.solve_button.config(state=DISABLED)
+        self.clear_button.config(state=DISABLED)
+        self.cancel_button.config(state=NORMAL)
+        self.poll_solver()
+
+    def run_solver(self):
+        """Body of the solver thread.  Only sets attributes: Tkinter may
+        only be used from the main thread."""
+        stats = SolveStats(on_branch=self.check_cancelled, on_backtrack=self.check_cancelled,
+                           on_propagate=self.check_cancelled)
+        try:
+            self.solve_result = self.puzzle.solve(stats=stats)
+        except SolveCancelled as e:
+            self.solve_result = e
+
+    def check_cancelled(self, puzzle, *args):
+        """SolveStats hook run in the solver thread: stop if asked to"""
+        if self.cancel_requested:
+            raise SolveCancelled()
+
+    def cancel_pressed(self):
+        self.cancel_requested = True
+
+    def poll_solver(self):
+        """Show the solver thread's progress, and its result once it has
+        finished; until then, check again shortly"""
+        elapsed = time.perf_counter() - self.solve_start
+        self.canvas.itemconfig(self.progress_message,
+                               text='%d nodes, %.1f s' % (self.puzzle.nodes, elapsed))
+        if self.solver.is_alive():
+            self.canvas.after(100, self.poll_solver)
+            return
+        self.solver = None
+        self.solve_button.config(state=NORMAL)
+        self.clear_button.config(state=NORMAL)
+        self.cancel_button.config(state=DISABLED)
+        solution = self.solve_result
+        if isinstance(solution, SolveCancelled):
+            self.canvas.itemconfig(self.error_message, text='Cancelled')
+        elif solution is None:
             self.canvas.itemconfig(self.error_message, text='No solution')
         else:
             for row in range(self.puzzle.max_val):
                 for col in range(self.puzzle.max_val):
-                    if puzzle_2solve.cell[row][col].value == 0:
+                    if self.puzzle.values[row*self.puzzle.max_val + col] == 0:
                         self.canvas.itemconfig(self.cell_vtag[row][col], text=str(solution.cell[row][col].value), fill='green')
+            self.showing_solution = True
 
 
 if __name__ == '__main__':
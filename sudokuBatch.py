@@ -0,0 +1,177 @@
+# Sudoku Batch Solver
+# Solves many Sudoku puzzles across a pool of worker processes
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuBatch.py [options] puzzle_file
+# Run with --help for the list of options.
+
+from sudoku import *
+from sudokuIO import read_puzzles, write_grid
+import argparse
+import collections
+import itertools
+import multiprocessing
+import queue
+import sys
+import time
+
+class BatchResult(object):
+    """The outcome of solving one puzzle of a batch.
+    Attributes:
+    index: position of the puzzle in the batch (0 for the first)
+    puzzle: the puzzle, as a single line string (see Sudoku.to_string)
+    solution: the solution as a single line string, or None if not solved
+    status: 'solved', 'no solution' or 'error'
+    seconds: time taken to solve the puzzle, in seconds
+    error: the error message if status is 'error', else None
+    """
+    def __init__(self, index, puzzle, solution=None, status='solved', seconds=0.0, error=None):
+        self.index = index
+        self.puzzle = puzzle
+        self.solution = solution
+        self.status = status
+        self.seconds = seconds
+        self.error = error
+
+    def __repr__(self):
+        return 'BatchResult(%d, %s, %.6fs)' % (self.index, self.status, self.seconds)
+
+    def solution_sudoku(self):
+        """Return the solution as a Sudoku puzzle, or None if not solved"""
+        if self.solution is None:
+            return None
+        return Sudoku.from_string(self.solution)
+
+def solve_one(job):
+    """Solve one puzzle of a batch.  job is (index, puzzle string, keyword
+    arguments for Sudoku.solve).  Never raises: any error is reported in
+    the returned BatchResult so the rest of the batch carries on."""
+    index, text, options = job
+    start = time.perf_counter()
+    try:
+        solution = Sudoku.from_string(text).solve(**options)
+    except Exception as e:
+        return BatchResult(index, text, None, 'error', time.perf_counter() - start,
+                           '%s: %s' % (type(e).__name__, e))
+    seconds = time.perf_counter() - start
+    if solution is None:
+        return BatchResult(index, text, None, 'no solution', seconds)
+    return BatchResult(index, text, solution.to_string(), 'solved', seconds)
+
+def solve_chunk(jobs):
+    """Solve a list of jobs in a worker process (see solve_one)"""
+    return [solve_one(job) for job in jobs]
+
+def solve_many(puzzles, workers=None, chunksize=1, ordered=True, window=None, **options):
+    """Solve each puzzle in the iterable puzzles (Sudoku puzzles or single
+    line strings) and yield a BatchResult for each as it is finished.
+    Puzzles are handed out chunksize at a time to a pool of workers
+    processes (None for one per CPU; 0 or 1 solves them in this process).
+    At most window chunks (default two per worker) are in the pool at once,
+    and puzzles are only taken from the iterable as chunks are sent, so a
+    puzzle file of any size is solved in constant memory.  Results come
+    back in the order of puzzles if ordered is True, or as soon as each
+    chunk is done otherwise.  Any other keyword arguments are passed on to
+    Sudoku.solve."""
+    jobs = ((index, puzzle if isinstance(puzzle, str) else puzzle.to_string(), options)
+            for index, puzzle in enumerate(puzzles))
+    if workers is not None and workers <= 1:
+        for job in jobs:
+            yield solve_one(job)
+        return
+    workers = workers or multiprocessing.cpu_count()
+    window = window or 2*workers
+    chunks = iter(lambda: list(itertools.islice(jobs, chunksize)), [])
+    pool = multiprocessing.Pool(workers)
+    try:
+        if ordered:
+            pending = collections.deque()
+            for chunk in itertools.islice(chunks, window):
+                pending.append(pool.apply_async(solve_chunk, (chunk,)))
+            while pending:
+                results = pending.popleft().get()
+                for chunk in itertools.islice(chunks, 1):
+                    pending.append(pool.apply_async(solve_chunk, (chunk,)))
+                for result in results:
+                    yield result
+        else:
+            done = queue.Queue()
+            in_flight = 0
+            for chunk in itertools.islice(chunks, window):
+                pool.apply_async(solve_chunk, (chunk,), callback=done.put)
+                in_flight += 1
+            while in_flight:
+                results = done.get()
+                in_flight -= 1
+                for chunk in itertools.islice(chunks, 1):
+                    pool.apply_async(solve_chunk, (chunk,), callback=done.put)
+                    in_flight += 1
+                for result in results:
+                    yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Solve every puzzle in a puzzle file (see sudokuIO.py), '
+                                                 'writing the solutions in the sudoku.dat format.')
+    parser.add_argument('puzzle_file', help='file of puzzles to solve')
+    parser.add_argument('-o', '--output', help='file to write the solutions to (default: standard output)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('--chunksize', type=int, default=1, help='puzzles sent to a worker at a time')
+    parser.add_argument('--unordered', action='store_true', help='write solutions as they complete')
+    parser.add_argument('--engine', choices=['search', 'dlx'], default=None, help='solver engine')
+    parser.add_argument('--strategies', default=None,
+                        help='comma separated propagation strategies (default: %s)' % ','.join(DEFAULT_STRATEGIES))
+    args = parser.parse_args(args)
+    options = {'engine': args.engine}
+    if args.strategies is not None:
+        options['strategies'] = [s for s in args.strategies.split(',') if s]
+    answers = {} # Answers of the puzzles being solved, by index
+    read_errors = {} # Puzzles that could not be read, by index
+    def puzzles():
+        for index, record in enumerate(read_puzzles(args.puzzle_file, skip_errors=True)):
+            if record.error is not None:
+                read_errors[index] = record.error
+                yield '' # Passed through so its result keeps its place
+                continue
+            if record.answer is not None:
+                answers[index] = record.answer
+            yield record.puzzle
+    fout = open(args.output, 'w') if args.output else sys.stdout
+    counts = {}
+    total = 0
+    start = time.perf_counter()
+    for result in solve_many(puzzles(), args.workers, args.chunksize, not args.unordered, **options):
+        total += 1
+        answer = answers.pop(result.index, None)
+        status = result.status
+        error = result.error
+        if result.index in read_errors:
+            status, error = 'error', read_errors.pop(result.index)
+        if status == 'solved' and answer is not None:
+            try:
+                if result.solution_sudoku() != Sudoku.from_string(answer):
+                    status = 'wrong answer'
+            except ValueError as e:
+                status, error = 'bad answer', 'Answer: %s' % e
+        counts[status] = counts.get(status, 0) + 1
+        fout.write('# Puzzle %d: %s in %.6f seconds\n' % (result.index+1, status, result.seconds))
+        if error:
+            fout.write('# %s\n' % error)
+        write_grid(fout, result.puzzle)
+        if result.solution is not None:
+            write_grid(fout, result.solution)
+    if fout is not sys.stdout:
+        fout.close()
+    seconds = time.perf_counter() - start
+    print('%d puzzles in %.3f seconds (%.1f puzzles/sec): %s' % (total, seconds,
+          total / seconds if seconds else 0.0,
+          ', '.join('%d %s' % (counts[s], s) for s in sorted(counts))), file=sys.stderr)
+    return 0 if set(counts) <= {'solved'} else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# Sudoku Batch Solver Tests
+# Checks that sudokuBatch.py keeps going past bad puzzles and reads its
+# input a window at a time
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuBatchTest.py
+
+from sudoku import *
+from sudokuBatch import main, solve_many
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+PUZZLE = '4-----8-5-3----------7------2-----6-----8-4------1-------6-3-7-5--2-----1-4------'
+
+class TestSolveMany(unittest.TestCase):
+    def test_window(self):
+        # Puzzles are taken from the iterable only as chunks go to the pool
+        taken = []
+        def puzzles():
+            for i in range(40):
+                taken.append(i)
+                yield PUZZLE
+        results = solve_many(puzzles(), workers=2, chunksize=2, window=3)
+        first = next(results)
+        self.assertEqual(first.status, 'solved')
+        self.assertLessEqual(len(taken), 2*(3+1) + 1)
+        self.assertEqual(sum(1 for result in results) + 1, 40)
+        results.close()
+
+    def test_unordered(self):
+        results = list(solve_many([PUZZLE] * 10 + ['11' + '-'*79], workers=2, ordered=False, window=2))
+        self.assertEqual(sorted(result.index for result in results), list(range(11)))
+        self.assertEqual(sum(result.status == 'solved' for result in results), 10)
+
+class TestMain(unittest.TestCase):
+    def run_main(self, text):
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            out, err = io.StringIO(), io.StringIO()
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                status = main(['-j', '2', path])
+            return status, out.getvalue(), err.getvalue()
+        finally:
+            os.remove(path)
+
+    def test_bad_records(self):
+        # An illegal puzzle, a malformed line and an illegal answer are
+        # each reported, and the puzzles after them still get solved
+        solution = Sudoku.from_string(PUZZLE).solve().to_string()
+        lines = ['11' + '-'*79, PUZZLE + ',' + solution, 'abc', PUZZLE + ',' + '11' + solution[2:], PUZZLE]
+        status, out, err = self.run_main('\n'.join(lines) + '\n')
+        self.assertEqual(status, 1)
+        self.assertIn('# Puzzle 4: bad answer', out)
+        self.assertIn('# Puzzle 5: solved', out)
+        self.assertIn('Line 3:', out)
+        self.assertIn('5 puzzles', err)
+        self.assertIn('2 error', err)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,289 @@
+# Sudoku Solver Benchmark
+# Times the Sudoku engines over fixed-seed generated puzzle corpora and
+# writes the results as JSON, to compare between versions
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuBench.py [-o results.json] [--compare baseline.json]
+# Run with --help for the list of options.
+
+from sudoku import *
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+# Every corpus is made of randomly relabelled and shuffled copies (see
+# shuffle_puzzle) of a few known puzzles, each with a unique solution.
+
+# Puzzles that need no search, from sudoku.dat
+EASY_PUZZLES = [
+    '53--7----6--195----98----6-8---6---34--8-3--17---2---6-6----28----419--5----8--79',
+    '-4---92----9-----------2--6--5-98--13--274----7-----8----3--17-----179--5--------',
+    '-------529-782--------7----------------39-1-868-1----3-12--7-6---56---3-3------9-',
+    '-1------79--1------8-75-----------3--4---9-----24-5---8--5---23-6---3-1-7--8625--',
+    '51---6-7--4-----829-----53--6---54----9--8---------89----------68-579-1--53-62---',
+]
+
+# Well known hard puzzles (AI Escargot, Arto Inkala's 2012 puzzle, Easter
+# Monster, a puzzle of Tarek's) and the hardest 9x9 puzzle in sudoku.dat
+HARD_PUZZLES = [
+    '1----7-9--3--2---8--96--5----53--9---1--8---26----4---3------1--4------7--7---3--',
+    '8----------36------7--9-2---5---7-------457-----1---3---1----68--85---1--9----4--',
+    '1-------2-9-4---5---6---7---5-9-3-------7-------85--4-7-----6---3---9-8---2-----1',
+    '--1--4-------6-3-5---9-----8-----7-3-------285---7-6--3---8---6--92------4---1---',
+    '3--4---9---7--18---1--6---5--1--74------8---29--6---3--6--4------4--5---5--2-----',
+]
+
+# Known 17 clue 9x9 puzzles
+SEVENTEEN_CLUE_PUZZLES = [
+    '000000010400000000020000000000050407008000300001090000300400200050100000000806000',
+    '000000010400000000020000000000050604008000300001090000300400200050100000000807000',
+    '000000012000035000000600070700000300000400800100000000000120000080000040050000600',
+    '000000012003600000000007000410020000000500300700000600280000040000300500000000000',
+    '000000012008030000000000040120500000000004700060000000507000300000620000000100000',
+]
+
+# 16x16 puzzles made with sudokuGen.py (two minimal, three stopped at 95
+# or 96 clues)
+SIXTEEN_PUZZLES = [
+    '----9---7D-----G-3--5-G--8-2-D-9-8--1FD----3---717--3--E----4A----B--8E--13--7---A-G-6-----F---4--1-F------6-2---9E6----G45-B-1-'
+    '--3--4C---E196-----B-26135F-E-----------89---GAD---EB------------6-----3----D5--8-DA---4F-----2----4--A-C--G-1B----9--8F6-----C-',
+    '-B-F---A2--G----------D----3-----C-------9F753--D--52-----1---C-E9--3--B-----A7---------F-4A-D8E--C-8--D-1B--4--4----E--C--62G-B'
+    '14B-5F----3-9----G--6-93-2---8---2---B--E47FG------7C------1AE6-G761--5F----D-------1A--D-8----2-3------G-------9DE---32----F-4C',
+    '-CBE-9-1-G-3---6D4-1--F----6--E8---6--8E-C--------A---C-----7---8--7-5-29-3--B-1---G8-6-7-E-3-2-B-2-----6A8--FC------B7----C-6--'
+    '---------EC-BA-G-38-G-D--F6925--1-D2A--3B-----F-4-G---2B----------9-48------1---7-346-----5BE---G------9--F4-7B---C-5--D--A--83-',
+    '--D-2-1----8---3-4-963--25-----BE-G--A-4---F-6-9-258------7-1--F5-B---A8-14D--7---2FG--B---95D---A-------3--9--E47--3D5CG-------'
+    '----A---5--3--B---6--C9--D---23-21F--G4-----8-A---84-F----2-7--59F-B-7------6---8--6--2---E---D--------G-8A-49--D----83-B-G2----',
+    '3-5-8F--B2-9D-G-A-7-D--C---E--9---B-293--D---675--C--7------2-A-47-C------FB-9E2E---C-61A-94--3-8------9---G--41---D--E-5--8----'
+    '---B--D-4--7E-------3-B-G1E-A--82F----------65-4--GA1E---------7-C----54-AG-7F---9-5---2-------AG--------8---DB-F---E1--3-B--G--',
+]
+
+# 25x25 puzzles made with sudokuGen.py, stopped at 315 clues: below that
+# each uniqueness check takes seconds.  They need little search.
+TWENTY_FIVE_PUZZLES = [
+    '-L---61D8G---7E--2A-N5-FJ---H--34C--KIPD-7-8-9LMGO-I18-K-AJN5---9---DO-47--7D-F-H59--JB------NP6A----93---B--PAFN-O-6---I-K8-'
+    'O7-PL5-2H--EC---D-1B----4M3---F-C--DP52G-A9--KO1781E----9M-K3O-IL--P58---N25---68--7-M1--FO-I-H--B--8--BFO--P16----N---M---5-'
+    'L----N--EI-C--M-------2D-I-NOECMG----D1J--8-F-95--31---7-K-4---G5-PE-2--A-----4P---9----EHM-1L-8--O-G28-H1-3-5----6CO---EKIP-'
+    '-----M---L--63I---O5AB--FE-ON3-F---4--C-LK--1--J67D6-24PO---HL--N8-7E9-I--59M----K---2J7A-64HF3-N-L--FL--B6H--E5-O1PMNI--3---'
+    '-HC-7--O1--I----N-M--F3-BPB-6DI4---7H-83J--2----M-NOGL-3--D2---B4--FC---PAEA------5L-----2H----CDNK-2-45---F-ML--DCK-O3-71-H6',
+    '-KH-1N--76--A--B--M8OE3-PN-8--O3P-M-B7-6-9-KF-J-LC-MFB---1CE--N--6-----79-5L---A8-5---E-IMN-2--14-K--CO-2-FK9-4-1G-7--H-BA---'
+    '--1-OG2A-5--E--3--8-6PBF--I--D74C--8---AJ--G6-H--K-4-----FJ3HK-7-IA---LD2-GFGC-E-K8--J6-P2MDHB---N-O3----6H-DB-FC1-K7--2-84I-'
+    'OEM65-D--C-1247G--ILN-K---B--NH----E-----F36M-O7-ID7--F2----B--LKHCOP----4-C2AP--J---I-G-H---5KF-DML1-I-K-7M--OD6-C-2-E-G-A-J'
+    '2-----6H--AOL-1---7P-IE94--E--4--A--P---1-I2-8KC-3A--I6P--O-M3--E----5--J---D--4B--F19-I-8---AGML--NM3-1L---E8------K------A2'
+    'I-D-MCEG-7-H----N-94K--OAK-5-JLPO--GA-M3--------6-P-9A-3---DN7--IO6K---C---E-3C-----F--9O-2-----N----O-H-A1-5N--K-L---3D4-8J9',
+    '7HNF2-1--L6M38B-G4C-OE9I-6LBA--H-GNKI---2---P1-C--P-4-M8--3--157A6L--B---2------CI-----D---9-----7-L-5--87-D---G-HP-----M-6A-'
+    'J-8-B--C-4OEM2-76---N-------N-O---7-4-I-31-5----GD----OP8--E--6-9KM2-C3-1-I-9--P------B--DO8HLFK--C---F-63-1--8-C----IBG-L2-7'
+    '5---G--A---NOP3-2-18LID69NOM------B18-4-9-L6A5FJ7-I-2--K-NP9M--6--B53-EO4--9-C-L-6I--D---ENJ--4--38G---1JD---C-7--2-O-P-A-NM-'
+    '---K--O-N-I6J-45-C--21B--EI---J--2M-583G1P-D6-7-9-HM--N-9---7---K-E-82G-5P4--OC5G--1K2LF-H--9---J-3-G3D--B5-H--9AEML4-J-F-K--'
+    '-N9-4---LI5PH---C8-K76-E--JE--6-89D---C7B-F------A--P----3---KB-8-D-ELC-F-1-------HKGADEL6-3PON---B----8-F---143----7G-5D--K2',
+    'P-E7-4K--1HA-2--DM---L-----6----8-7-B9MEH4LG-K-AN-N-L-9-BA2ED3-F----J--MGP--1----IDO-G4-L6C7FB-E---HGD---F-------P--1E3K-I---'
+    'H--IOJP2------8-----L5---A-3EJD1-8I7-M----N2B-P94K--C-L--NM-O-5J-E-1--A--3-6---PB3C--9-FG-4O---2E1HN521---7O----A-N-H---G-IMJ'
+    '8--HEIC--KB-J3--M519-2--AK-O1A-----N9D--3--6E--P-G---P67OH-N21I5--ACL-B8E---3--MED1G8---AK---OJHN------N--J---ME-HP-84---O3K-'
+    '---6------4--C-5-GP--HD-9-7PC35--L---69-----4I-8A--9KF-PM3-C---D1J-I------LE--LD18B-2KJN7-O--9-P-M--1-----694-----B-L----C-F2'
+    '--MDH-N-B-A6-4----718----CP-GK--61-I23N-FJO----H---A---GH-P58M--F-2-----NO-F--JI--7D-L5B-G---HNM3-2-O-2-1L-I-3-7HK--E--MF--B4',
+    '3B----6F2-974H----M-I--E---NJ---I7-8K-----4---B-MG-----KL5P-3-B-O-8DEH--J9--2--149E-M------B3I---K-NHL--K----N-----12---34--8'
+    '4--BF---8-L-3--P-G-1M2--OKGLO69-N-B--58-A7---J-1F-DI--NMO4GEJ---9-H2-35KL--J--5---L-K--H-7---48-E--D--1-----D---AFG-OJKI97N--'
+    'AKH-7-E-----F--3-----9B1-OJPN3FC-1--H2KM----B4-5I-I64-BA---9-P-LJ-1-7---G2-F--1-I-P4---956G-H-J-L-NA--G2--7-B---1-DM-N-4K-6OJ'
+    '----GNA----9-O--3B-------C----------L-M-IF8NAH6P3-LO--DPF2----CBNE-7HK1-8---FB---MK-46-I3A-DC-9----75A--I7D1--F-8E-2POG6BN9-L'
+    'M1-H-2-C-F-AEIB-4K--L---5G-A--L---O-M--F--1-CE8----C-K---M--4O-G8-L-9-----1B-FEJ---K-C5D-LO--3G---P92D68-G49IA1J---5---M-OH-F',
+]
+
+# Corpus name -> (puzzles to make it from, number of puzzles at scale 1)
+CORPORA = {
+    '9x9-easy': (EASY_PUZZLES, 200),
+    '9x9-hard': (HARD_PUZZLES, 100),
+    '9x9-17': (SEVENTEEN_CLUE_PUZZLES, 50),
+    '16x16': (SIXTEEN_PUZZLES, 20),
+    '25x25': (TWENTY_FIVE_PUZZLES, 5),
+}
+
+# Engine name -> keyword arguments for Sudoku.solve.  Node counts are as
+# reported in Sudoku.nodes: values tried at branch points for the search
+# engine (with either backtrack mode), rows chosen (including forced ones)
+# for dlx.
+ENGINE_OPTIONS = {
+    'search': {'engine': 'search'},
+    'search-copy': {'engine': 'search', 'backtrack': 'copy'},
+    'search-singles': {'engine': 'search', 'strategies': []},
+    'search-all': {'engine': 'search', 'strategies': list(STRATEGIES)},
+    'search-degree': {'engine': 'search', 'heuristic': 'degree'},
+    'search-lcv': {'engine': 'search', 'heuristic': 'lcv'},
+    'search-degree-lcv': {'engine': 'search', 'heuristic': 'degree-lcv'},
+    'search-random': {'engine': 'search', 'heuristic': 'random', 'seed': 1},
+    'search-restarts': {'engine': 'search', 'heuristic': 'random', 'seed': 1, 'restart_nodes': 100},
+    'dlx': {'engine': 'dlx'},
+}
+
+DEFAULT_ENGINES = ['search', 'dlx']
+
+def shuffle_puzzle(values, box_size, rnd):
+    """Return a copy of a flat list of cell values with the digits
+    relabelled, the rows shuffled within each band and the bands shuffled,
+    the columns and stacks likewise, and maybe transposed.  The result is a
+    different puzzle of the same difficulty (and with the same number of
+    solutions)."""
+    max_val = box_size**2
+    labels = list(range(1, max_val+1))
+    rnd.shuffle(labels)
+    def order():
+        bands = list(range(box_size))
+        rnd.shuffle(bands)
+        result = []
+        for band in bands:
+            lines = list(range(band*box_size, (band+1)*box_size))
+            rnd.shuffle(lines)
+            result.extend(lines)
+        return result
+    rows = order()
+    cols = order()
+    transpose = rnd.random() < 0.5
+    result = []
+    for r in range(max_val):
+        for c in range(max_val):
+            row, col = (cols[c], rows[r]) if transpose else (rows[r], cols[c])
+            value = values[row*max_val + col]
+            result.append(labels[value-1] if value else 0)
+    return result
+
+def make_corpus(name, count, seed=1):
+    """Return a list of count single line puzzle strings for the named
+    corpus (see CORPORA), the same every time for the same seed.  Each is
+    a shuffled copy of one of the corpus's puzzles, taken in turn, so it
+    has a unique solution and needs as much search as the original."""
+    bases, default_count = CORPORA[name]
+    bases = [Sudoku.from_string(base) for base in bases]
+    rnd = random.Random('%s:%d' % (name, seed))
+    puzzles = []
+    for i in range(count):
+        base = bases[i % len(bases)]
+        puzzles.append(values2string(shuffle_puzzle(base.values, base.box_size, rnd)))
+    return puzzles
+
+def percentile(sorted_values, p):
+    """Return the p'th percentile (nearest rank) of a sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(p / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+def run_benchmark(name, puzzles, engine, measure_memory=True):
+    """Solve each puzzle with the named engine (see ENGINE_OPTIONS) and
+    return a dictionary of results: throughput, latency percentiles,
+    search node counts and (if measure_memory) peak traced memory, which
+    is measured in a second pass so it does not slow down the timings."""
+    options = ENGINE_OPTIONS[engine]
+    sudokus = [Sudoku.from_string(text) for text in puzzles]
+    latencies = []
+    nodes = []
+    solved = 0
+    start = time.perf_counter()
+    for puzzle in sudokus:
+        t = time.perf_counter()
+        solution = puzzle.solve(**options)
+        latencies.append(time.perf_counter() - t)
+        nodes.append(puzzle.nodes)
+        if solution is not None and solution.solved():
+            solved += 1
+    seconds = time.perf_counter() - start
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        for puzzle in sudokus:
+            puzzle.solve(**options)
+            peak = max(peak or 0, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        tracemalloc.stop()
+    latencies.sort()
+    return {
+        'corpus': name,
+        'engine': engine,
+        'puzzles': len(puzzles),
+        'solved': solved,
+        'seconds': seconds,
+        'puzzles_per_sec': len(puzzles) / seconds if seconds else 0.0,
+        'latency': {
+            'mean': seconds / len(puzzles) if puzzles else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else 0.0,
+        },
+        'nodes': {
+            'total': sum(nodes),
+            'mean': float(sum(nodes)) / len(nodes) if nodes else 0.0,
+            'max': max(nodes) if nodes else 0,
+        },
+        'peak_memory_bytes': peak,
+    }
+
+def compare(results, baseline, threshold):
+    """Print how each result compares with the matching result in baseline
+    and return the list of (corpus, engine) pairs whose p50 latency or mean
+    node count got worse by more than threshold (a fraction)."""
+    old = {(r['corpus'], r['engine']): r for r in baseline['results']}
+    regressions = []
+    for r in results['results']:
+        b = old.get((r['corpus'], r['engine']))
+        if b is None:
+            continue
+        worse = []
+        for label, new, was in (('p50', r['latency']['p50'], b['latency']['p50']),
+                                ('nodes', r['nodes']['mean'], b['nodes']['mean'])):
+            change = (new - was) / was if was else 0.0
+            print('%-10s %-18s %-6s %12.6g -> %12.6g (%+.1f%%)' % (r['corpus'], r['engine'], label, was, new, 100*change))
+            if change > threshold:
+                worse.append(label)
+        if worse:
+            regressions.append((r['corpus'], r['engine']))
+    return regressions
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Sudoku solver engines on generated corpora.')
+    parser.add_argument('-o', '--output', help='file to write the JSON results to')
+    parser.add_argument('--corpora', default=','.join(CORPORA),
+                        help='comma separated corpora to run (default: %(default)s)')
+    parser.add_argument('--engines', default=','.join(DEFAULT_ENGINES),
+                        help='comma separated engines to run, from %s (default: %%(default)s)' % ', '.join(ENGINE_OPTIONS))
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the number of puzzles in each corpus')
+    parser.add_argument('--seed', type=int, default=1, help='corpus seed')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory pass')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='fractional slowdown counted as a regression (default: %(default)s)')
+    args = parser.parse_args(args)
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': args.seed,
+        'scale': args.scale,
+        'results': [],
+    }
+    for name in args.corpora.split(','):
+        puzzles = make_corpus(name, max(1, int(CORPORA[name][1] * args.scale)), args.seed)
+        for engine in args.engines.split(','):
+            r = run_benchmark(name, puzzles, engine, not args.no_memory)
+            results['results'].append(r)
+            print('%-10s %-18s %5d/%-5d %10.1f/s  p50 %.6f  p95 %.6f  p99 %.6f  nodes %10.1f  peak %s'
+                  % (name, engine, r['solved'], r['puzzles'], r['puzzles_per_sec'], r['latency']['p50'],
+                     r['latency']['p95'], r['latency']['p99'], r['nodes']['mean'], r['peak_memory_bytes']))
+            sys.stdout.flush()
+    if args.output:
+        with open(args.output, 'w') as fout:
+            json.dump(results, fout, indent=2)
+    if args.compare:
+        with open(args.compare) as fin:
+            regressions = compare(results, json.load(fin), args.threshold)
+        if regressions:
+            print('Regressions:', ', '.join('%s/%s' % r for r in regressions))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
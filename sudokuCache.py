@@ -0,0 +1,257 @@
+# Sudoku Solution Cache
+# Caches solutions by a canonical form of the puzzle, so puzzles that are
+# the same up to relabelling the values, shuffling rows within bands,
+# shuffling bands, the same for columns and stacks, and transposing, all
+# share one cache entry
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+
+from sudoku import Sudoku, values2string
+import collections
+import itertools
+import sqlite3
+
+# Most orderings of tied rows/columns tried when canonicalizing.  Past
+# this, the orderings tried depend on the puzzle's own labelling, so
+# equivalent puzzles may get different keys (a cache miss, never a wrong
+# answer).  Rows and columns are told apart only by their clue counts, so
+# this happens whenever many lines tie: nearly empty puzzles, but also
+# nearly full ones and solved grids, where every line has the same count
+# (in testing, every shuffled solved grid and about half of shuffled 78
+# clue puzzles, but no puzzles with realistic numbers of clues).
+MAX_ORDERINGS = 2000
+
+class Transform(object):
+    """A symmetry of a Sudoku puzzle, mapping a puzzle to its canonical form.
+    Cell (r, c) of the transformed puzzle is cell (rows[r], cols[c]) of the
+    original, or (cols[c], rows[r]) if transpose is True, with each value v
+    replaced by labels[v].
+    Attributes:
+    max_val: maximum numeric value of a cell
+    transpose: True if rows and columns are swapped
+    rows: the original row (column, if transposed) of each transformed row
+    cols: the original column (row, if transposed) of each transformed column
+    labels: a list mapping each original value to its new value (labels[0]
+          is 0, for empty cells)
+    """
+    def __init__(self, max_val, transpose, rows, cols, labels):
+        self.max_val = max_val
+        self.transpose = transpose
+        self.rows = rows
+        self.cols = cols
+        self.labels = labels
+
+    def source_index(self, r, c):
+        """Return the flat index in the original puzzle of transformed cell
+        (r, c)"""
+        if self.transpose:
+            return self.cols[c]*self.max_val + self.rows[r]
+        return self.rows[r]*self.max_val + self.cols[c]
+
+    def apply(self, values):
+        """Return the transformed copy of a flat list of cell values"""
+        labels = self.labels
+        return [labels[values[self.source_index(r, c)]]
+                for r in range(self.max_val) for c in range(self.max_val)]
+
+    def invert(self, values):
+        """Return the original puzzle's flat list of cell values for a
+        transformed flat list (the inverse of apply)"""
+        unlabel = [0] * len(self.labels)
+        for old, new in enumerate(self.labels):
+            unlabel[new] = old
+        result = [0] * len(values)
+        for r in range(self.max_val):
+            for c in range(self.max_val):
+                result[self.source_index(r, c)] = unlabel[values[r*self.max_val + c]]
+        return result
+
+def _line_orders(counts, cross_counts, box_size):
+    """Return the line orders to try for one direction (rows or columns) of
+    a puzzle.  counts[i] is the number of clues in line i and
+    cross_counts[i] the sorted clue counts of the crossing lines at its
+    clues; both are unchanged by any symmetry, so sorting lines by them
+    gives the same order for every equivalent puzzle.  Bands are sorted by
+    key then lines within each band, and tied bands or lines are tried in
+    every order."""
+    line_key = [(counts[i], cross_counts[i]) for i in range(len(counts))]
+    bands = []
+    for band in range(box_size):
+        lines = sorted(range(band*box_size, (band+1)*box_size), key=lambda i: line_key[i])
+        bands.append((sorted(line_key[i] for i in lines), lines))
+    bands.sort(key=lambda b: b[0])
+    # Options: every order of each run of tied bands, and within each band
+    # every order of each run of tied lines
+    band_options = []
+    for key, group in itertools.groupby(bands, key=lambda b: b[0]):
+        group = [lines for k, lines in group]
+        band_options.append(list(itertools.permutations(group)))
+    orders = []
+    for band_choice in itertools.product(*band_options):
+        line_options = []
+        for tied_bands in band_choice:
+            for lines in tied_bands:
+                for key, group in itertools.groupby(lines, key=lambda i: line_key[i]):
+                    line_options.append(list(itertools.permutations(list(group))))
+        for line_choice in itertools.product(*line_options):
+            orders.append([i for run in line_choice for i in run])
+            if len(orders) >= MAX_ORDERINGS:
+                return orders
+    return orders
+
+def _relabelled(values, max_val, transpose, rows, cols, best):
+    """Return the relabelled transformed values and labels for one
+    arrangement, or None as soon as it is known to be worse than best"""
+    labels = [0] * (max_val+1)
+    next_label = 1
+    result = []
+    for r in range(max_val):
+        for c in range(max_val):
+            if transpose:
+                v = values[cols[c]*max_val + rows[r]]
+            else:
+                v = values[rows[r]*max_val + cols[c]]
+            if v and not labels[v]:
+                labels[v] = next_label
+                next_label += 1
+            new = labels[v]
+            if best is not None:
+                old = best[len(result)]
+                if new > old:
+                    return None
+                if new < old:
+                    best = None # Already better; stop comparing
+            result.append(new)
+    for v in range(1, max_val+1): # Values that are not in the puzzle
+        if not labels[v]:
+            labels[v] = next_label
+            next_label += 1
+    return result, labels
+
+def canonical_form(puzzle):
+    """Return (key, transform) for a Sudoku puzzle: key is the single line
+    string of its canonical form and transform is the Transform taking the
+    puzzle to that form.  The key is the same for every equivalent puzzle
+    as long as the tied row and column orderings fit in MAX_ORDERINGS (see
+    there)."""
+    box_size = puzzle.box_size
+    max_val = puzzle.max_val
+    values = puzzle.values
+    filled = [[1 if values[r*max_val + c] else 0 for c in range(max_val)] for r in range(max_val)]
+    row_counts = [sum(row) for row in filled]
+    col_counts = [sum(filled[r][c] for r in range(max_val)) for c in range(max_val)]
+    row_cross = [tuple(sorted(col_counts[c] for c in range(max_val) if filled[r][c])) for r in range(max_val)]
+    col_cross = [tuple(sorted(row_counts[r] for r in range(max_val) if filled[r][c])) for c in range(max_val)]
+    row_orders = _line_orders(row_counts, row_cross, box_size)
+    col_orders = _line_orders(col_counts, col_cross, box_size)
+    best = None
+    best_transform = None
+    # Untransposed: rows come from row_orders; transposed: from col_orders
+    for transpose, first, second in ((False, row_orders, col_orders), (True, col_orders, row_orders)):
+        for rows in first:
+            for cols in second:
+                found = _relabelled(values, max_val, transpose, rows, cols, best)
+                if found is not None:
+                    best, labels = found
+                    best_transform = Transform(max_val, transpose, rows, cols, labels)
+                if len(first) * len(second) > MAX_ORDERINGS:
+                    break
+    return values2string(best), best_transform
+
+def solved_sudoku(puzzle, text):
+    """Return a solved Sudoku puzzle the size of puzzle from a single line
+    solution string.  The solution is copied straight in, without going
+    through set_cell, since it is already known to be legal."""
+    solution = Sudoku(puzzle.box_size)
+    solution.values = [puzzle.char2value(c) for c in text]
+    solution.possibles = [0] * len(text)
+    solution.cells_filled = len(text)
+    return solution
+
+class SolutionCache(object):
+    """A cache of puzzle solutions keyed by canonical form (see
+    canonical_form), so any puzzle equivalent to one already solved is
+    answered by transforming the cached solution back.  Exact repeats are
+    also remembered by their own string, which skips canonicalizing.
+    The in-memory cache keeps the maxsize most recently used entries.  If
+    path is given, entries are also kept in an SQLite database there,
+    which any number of processes can share.
+    Attributes:
+    maxsize: most entries kept in memory
+    hits: lookups answered from the in-memory cache
+    store_hits: lookups answered from the database
+    misses: lookups that had to be solved
+    """
+    def __init__(self, maxsize=10000, path=None):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, timeout=30)
+            self.db.execute('CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, solution TEXT)')
+            self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def remember(self, key, solution):
+        """Put an entry in the in-memory cache, dropping the least recently
+        used entry if it is full"""
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def lookup(self, key):
+        """Return the cached solution string for key ('' for no solution),
+        or None if key is not cached"""
+        solution = self.entries.get(key)
+        if solution is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return solution
+        if self.db is not None:
+            row = self.db.execute('SELECT solution FROM solutions WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.store_hits += 1
+                self.remember(key, row[0])
+                return row[0]
+        return None
+
+    def store(self, key, solution):
+        self.remember(key, solution)
+        if self.db is not None:
+            self.db.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?)', (key, solution))
+            self.db.commit()
+
+    def solve(self, puzzle, **options):
+        """Return the solution of a Sudoku puzzle (None if it has none),
+        from the cache if an equivalent puzzle has been solved before, else
+        by solving it with puzzle.solve(**options) and caching the result"""
+        raw_key = 'raw:' + puzzle.to_string()
+        solution = self.lookup(raw_key)
+        if solution is None:
+            key, transform = canonical_form(puzzle)
+            key = 'canonical:' + key
+            canonical = self.lookup(key)
+            if canonical is None:
+                self.misses += 1
+                result = puzzle.solve(**options)
+                canonical = '' if result is None else \
+                    values2string(transform.apply(result.values))
+                self.store(key, canonical)
+            if canonical == '':
+                solution = ''
+            else:
+                solution = values2string(transform.invert([puzzle.char2value(c) for c in canonical]))
+            self.store(raw_key, solution)
+        if solution == '':
+            return None
+        return solved_sudoku(puzzle, solution)
@@ -0,0 +1,57 @@
+# Sudoku Solution Cache Tests
+# Checks canonical forms and the solutions sudokuCache.py answers from them
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuCacheTest.py
+
+from sudoku import *
+from sudokuBench import HARD_PUZZLES, SEVENTEEN_CLUE_PUZZLES, shuffle_puzzle
+from sudokuCache import SolutionCache, canonical_form
+import random
+import unittest
+
+PUZZLES = HARD_PUZZLES + SEVENTEEN_CLUE_PUZZLES
+
+class TestCanonicalForm(unittest.TestCase):
+    def test_invert(self):
+        # The transform maps the puzzle to its key, and inverting it gives
+        # the puzzle back
+        rnd = random.Random(1)
+        for text in PUZZLES:
+            base = Sudoku.from_string(text)
+            for i in range(5):
+                puzzle = Sudoku.from_string(values2string(shuffle_puzzle(base.values, 3, rnd)))
+                key, transform = canonical_form(puzzle)
+                self.assertEqual(values2string(transform.apply(puzzle.values)), key)
+                self.assertEqual(transform.invert(transform.apply(puzzle.values)), puzzle.values)
+
+    def test_equivalent_puzzles(self):
+        # Shuffled copies of a realistic puzzle share its key
+        rnd = random.Random(2)
+        for text in PUZZLES:
+            base = Sudoku.from_string(text)
+            key = canonical_form(base)[0]
+            for i in range(5):
+                puzzle = Sudoku.from_string(values2string(shuffle_puzzle(base.values, 3, rnd)))
+                self.assertEqual(canonical_form(puzzle)[0], key)
+
+class TestSolutionCache(unittest.TestCase):
+    def test_solutions(self):
+        # Every answer, solved or from the cache, is the puzzle's solution
+        rnd = random.Random(3)
+        cache = SolutionCache()
+        for text in PUZZLES:
+            base = Sudoku.from_string(text)
+            for i in range(3):
+                puzzle = Sudoku.from_string(values2string(shuffle_puzzle(base.values, 3, rnd)))
+                solution = cache.solve(puzzle)
+                self.assertEqual(solution, Sudoku.from_string(puzzle.to_string()).solve())
+        # Only the first of each set of equivalent puzzles is solved
+        keys = set(canonical_form(Sudoku.from_string(text))[0] for text in PUZZLES)
+        self.assertEqual(cache.misses, len(keys))
+        self.assertIsNone(cache.solve(Sudoku.from_string('12345678-' + '-'*63 + '--------9')))
+
+if __name__ == '__main__':
+    unittest.main()
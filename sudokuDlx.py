@@ -0,0 +1,153 @@
+# Sudoku Exact Cover Solver
+# Solves Sudoku puzzles as exact cover problems with Dancing Links
+# (Knuth's Algorithm X)
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+
+class DancingLinks(object):
+    """An exact cover problem stored as a sparse matrix of doubly linked
+    nodes.  Node 0 is the root, nodes 1..columns are the column headers and
+    every 1 in the matrix is a node after those.  Links are kept in flat
+    lists indexed by node number rather than as node objects.
+    Attributes:
+    columns: the number of columns (constraints) in the matrix
+    left, right, up, down: the neighbouring node numbers of each node
+    col: the column header node of each node
+    size: the number of nodes left in each column (indexed by header node)
+    row_id: the caller's identifier for the row each node belongs to
+    nodes: the number of search nodes (rows tried) in the last search
+    """
+    def __init__(self, columns):
+        self.columns = columns
+        headers = range(columns+1)
+        self.left = [h-1 for h in headers]
+        self.left[0] = columns
+        self.right = [h+1 for h in headers]
+        self.right[columns] = 0
+        self.up = list(headers)
+        self.down = list(headers)
+        self.col = list(headers)
+        self.size = [0] * (columns+1)
+        self.row_id = [None] * (columns+1)
+        self.nodes = 0
+
+    def add_row(self, row_id, cols):
+        """Add a row with a 1 in each of the (1-based) column numbers in
+        cols, identified by row_id in search results"""
+        first = len(self.col)
+        for i, c in enumerate(cols):
+            node = first + i
+            self.left.append(node-1 if i else first + len(cols) - 1)
+            self.right.append(node+1 if i < len(cols)-1 else first)
+            self.up.append(self.up[c])
+            self.down.append(c)
+            self.down[self.up[c]] = node
+            self.up[c] = node
+            self.col.append(c)
+            self.row_id.append(row_id)
+            self.size[c] += 1
+
+    def cover(self, c):
+        left, right, up, down, col, size = self.left, self.right, self.up, self.down, self.col, self.size
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[col[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, c):
+        left, right, up, down, col, size = self.left, self.right, self.up, self.down, self.col, self.size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[col[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    def choose_column(self):
+        """Return the uncovered column with the fewest nodes left"""
+        right, size = self.right, self.size
+        best = c = right[0]
+        best_size = size[c]
+        while c != 0 and best_size > 1:
+            if size[c] < best_size:
+                best = c
+                best_size = size[c]
+            c = right[c]
+        return best
+
+    def search(self):
+        """Return the row_ids of a set of rows that covers every column
+        exactly once, or None if there is no such set.  The search is
+        iterative, so the depth is not limited by Python's recursion limit."""
+        right, left, down, col = self.right, self.left, self.down, self.col
+        chosen = []
+        self.nodes = 0
+        while True:
+            if right[0] == 0:
+                return [self.row_id[r] for r in chosen]
+            c = self.choose_column()
+            self.cover(c)
+            r = down[c]
+            while r == c: # Column has no rows left to try - backtrack
+                self.uncover(c)
+                if not chosen:
+                    return None
+                r = chosen.pop()
+                c = col[r]
+                j = left[r]
+                while j != r:
+                    self.uncover(col[j])
+                    j = left[j]
+                r = down[r]
+            chosen.append(r)
+            self.nodes += 1
+            j = right[r]
+            while j != r:
+                self.cover(col[j])
+                j = right[j]
+
+def exact_cover_solve(box_size, values, possibles):
+    """Solve a Sudoku puzzle given as flat lists of cell values (0 for
+    empty) and candidate bitmasks, as laid out in sudoku.Sudoku.  Return the
+    flat list of values of the solution (None if there is none) and the
+    number of search nodes it took.
+    Columns are the four Sudoku constraints: each cell holds one value, and
+    each row, column and box holds each value once.  Rows are the (cell,
+    value) choices, one per candidate of each empty cell and one for the
+    value of each filled cell."""
+    max_val = box_size**2
+    n2 = max_val*max_val
+    links = DancingLinks(4*n2)
+    for index in range(n2):
+        row, col = divmod(index, max_val)
+        box = row // box_size * box_size + col // box_size
+        if values[index]:
+            choices = [values[index]]
+        else:
+            choices = [v for v in range(1, max_val+1) if possibles[index] >> (v-1) & 1]
+        for value in choices:
+            links.add_row((index, value), (1 + index,
+                                           1 + n2 + row*max_val + value-1,
+                                           1 + 2*n2 + col*max_val + value-1,
+                                           1 + 3*n2 + box*max_val + value-1))
+    rows = links.search()
+    if rows is None:
+        return None, links.nodes
+    solution = [0] * n2
+    for index, value in rows:
+        solution[index] = value
+    return solution, links.nodes
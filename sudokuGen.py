@@ -0,0 +1,225 @@
+# Sudoku Puzzle Generator
+# Generates random puzzles with a unique solution and no unnecessary clues,
+# optionally of a target difficulty, across a pool of worker processes
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuGen.py [options]
+# Run with --help for the list of options.  Puzzles are written in the
+# sudoku.dat format (with answers), so sudokuEngTest.py can check them.
+
+from sudoku import *
+from sudokuIO import write_dat_record
+import argparse
+import multiprocessing
+import random
+import sys
+
+# Difficulty grades, easiest first: the propagation strategies that are
+# enough to solve a puzzle of that grade without any search.  A puzzle
+# that none of them can solve is graded 'search'.
+GRADES = [
+    ('singles', []),
+    ('hidden_singles', ['hidden_singles']),
+    ('intersections', ['hidden_singles', 'pointing_pairs', 'box_line']),
+    ('subsets', list(STRATEGIES)),
+]
+GRADE_NAMES = [name for name, strategies in GRADES] + ['search']
+
+# Puzzles of this box_size and up are generated one at a time, with their
+# clue-removal trials spread over the worker processes, since a single
+# puzzle takes seconds; smaller puzzles are generated one per process.
+PARALLEL_TRIALS_BOX_SIZE = 4
+
+def random_grid(box_size, rnd):
+    """Return a random solved Sudoku puzzle: the boxes on the diagonal
+    (which do not constrain each other) are filled with random
+    permutations, then the rest is solved"""
+    while True:
+        puzzle = Sudoku(box_size)
+        for box in range(box_size):
+            values = list(range(1, puzzle.max_val+1))
+            rnd.shuffle(values)
+            for i, value in enumerate(values):
+                puzzle.set_cell(value, box*box_size + i // box_size, box*box_size + i % box_size)
+        solution = puzzle.solve()
+        if solution is not None:
+            return solution
+
+def clue_order(puzzle, rnd, symmetric=False):
+    """Return the flat indexes of the cells to try removing, in a random
+    order, grouped in lists: pairs of cells opposite each other through the
+    centre if symmetric, else single cells"""
+    n2 = puzzle.max_val**2
+    if not symmetric:
+        groups = [[i] for i in range(n2)]
+    else:
+        groups = [sorted({i, n2-1-i}) for i in range(n2 // 2 + n2 % 2)]
+    rnd.shuffle(groups)
+    return groups
+
+def removal_keeps_unique(values, box_size, group, solution):
+    """Return True if the puzzle with the given flat values, less the clues
+    at the indexes in group, still has solution as its only solution.  Any
+    other solution would have to differ from it in a removed cell, so it is
+    enough to search with each removed cell's solution value ruled out."""
+    trial = values[:]
+    for i in group:
+        trial[i] = 0
+    puzzle = Sudoku(box_size)
+    for index, value in enumerate(trial):
+        if value:
+            puzzle.set_cell(value, *divmod(index, puzzle.max_val))
+    for i in group:
+        other = puzzle.copy()
+        other.remove_bits(value2bit(solution[i]), (i,))
+        if other.count_solutions(1):
+            return False
+    return True
+
+def removal_job(job):
+    """Run removal_keeps_unique in a worker process: job is its arguments"""
+    return removal_keeps_unique(*job)
+
+def reduce_clues(solution, rnd, symmetric=False, min_clues=0, pool=None, batch=1):
+    """Starting from a solved Sudoku puzzle, remove clues (in random order)
+    as long as the puzzle keeps a unique solution, and return the puzzle.
+    Every cell is tried once, which leaves a minimal puzzle: removing a clue
+    only ever adds solutions, so a clue that could not be removed earlier
+    cannot be removed later either.  Stop early at min_clues clues.
+    If pool (a multiprocessing.Pool) is given, the next batch untried
+    removals are tried at once in the pool, all against the current clues.
+    A removal that fails would fail after any other removal too, so only
+    successes after a clue is removed need trying again, and the result is
+    the same as trying them one at a time."""
+    values = solution.values[:]
+    clues = len(values)
+    # [group, None if untried with the current clues, else whether its
+    # removal keeps the solution unique]
+    pending = [[group, None] for group in clue_order(solution, rnd, symmetric)]
+    while pending:
+        group, keeps_unique = pending[0]
+        if clues - len(group) < min_clues:
+            break
+        if keeps_unique is None:
+            trials = [entry for entry in pending if entry[1] is None][:max(1, batch) if pool else 1]
+            jobs = [(values, solution.box_size, entry[0], solution.values) for entry in trials]
+            results = pool.map(removal_job, jobs) if pool else [removal_job(jobs[0])]
+            for entry, result in zip(trials, results):
+                entry[1] = result
+            continue
+        del pending[0]
+        if keeps_unique:
+            for i in group:
+                values[i] = 0
+            clues -= len(group)
+            for entry in pending:
+                if entry[1]:
+                    entry[1] = None
+    puzzle = Sudoku(solution.box_size)
+    for index, value in enumerate(values):
+        if value:
+            puzzle.set_cell(value, *divmod(index, puzzle.max_val))
+    return puzzle
+
+def grade(puzzle):
+    """Return the difficulty grade of a puzzle (see GRADES) and the number
+    of search nodes the default solver needs for it"""
+    name = 'search'
+    for grade_name, strategies in GRADES:
+        trial = puzzle.copy()
+        trial.propagate(find_strategies(strategies))
+        if trial.solved():
+            name = grade_name
+            break
+    puzzle.solve()
+    return name, puzzle.nodes
+
+def generate(box_size=3, seed=None, difficulty=None, min_nodes=None, max_nodes=None,
+             symmetric=False, min_clues=0, max_tries=1000, pool=None, batch=1):
+    """Return a (puzzle, solution, grade, nodes) tuple for a new random
+    puzzle with a unique solution.  If difficulty (a grade name) or a
+    min_nodes/max_nodes range of search nodes is given, puzzles are
+    generated until one matches, up to max_tries; raise RuntimeError if
+    none does.  pool and batch are as for reduce_clues."""
+    if difficulty is not None and difficulty not in GRADE_NAMES:
+        raise ValueError('Unknown difficulty: ' + str(difficulty))
+    rnd = random.Random(seed)
+    for attempt in range(max_tries):
+        solution = random_grid(box_size, rnd)
+        puzzle = reduce_clues(solution, rnd, symmetric, min_clues, pool, batch)
+        puzzle_grade, nodes = grade(puzzle)
+        if difficulty is not None and puzzle_grade != difficulty:
+            continue
+        if (min_nodes is not None and nodes < min_nodes) or (max_nodes is not None and nodes > max_nodes):
+            continue
+        return puzzle, solution, puzzle_grade, nodes
+    raise RuntimeError('No puzzle of the requested difficulty in %d tries' % max_tries)
+
+def generate_job(job, pool=None, batch=1):
+    """Generate one puzzle for generate_many: job is (seed, keyword
+    arguments for generate).  Returns single line strings so the result is
+    cheap to send back from a worker process."""
+    seed, options = job
+    puzzle, solution, puzzle_grade, nodes = generate(seed=seed, pool=pool, batch=batch, **options)
+    return puzzle.to_string(), solution.to_string(), puzzle_grade, nodes
+
+def generate_many(count, workers=None, seed=None, **options):
+    """Yield count (puzzle, solution, grade, nodes) tuples, the puzzle and
+    solution as single line strings, generated by a pool of workers
+    processes (None for one per CPU; 0 or 1 generates them in this
+    process).  Puzzles of box_size PARALLEL_TRIALS_BOX_SIZE and up are
+    generated in turn, each spreading its clue-removal trials over the
+    pool; smaller ones are generated one per worker.  Each puzzle has its
+    own seed, derived from seed, so a run is repeatable (and gives the same
+    puzzles for any number of workers).  Other keyword arguments are passed
+    on to generate."""
+    rnd = random.Random(seed)
+    jobs = [(rnd.getrandbits(64), options) for i in range(count)]
+    if workers is not None and workers <= 1:
+        for job in jobs:
+            yield generate_job(job)
+        return
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers)
+    try:
+        if options.get('box_size', 3) >= PARALLEL_TRIALS_BOX_SIZE:
+            for job in jobs:
+                yield generate_job(job, pool, workers)
+        else:
+            for result in pool.imap(generate_job, jobs):
+                yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Generate Sudoku puzzles with unique solutions, '
+                                                 'written with their answers in the sudoku.dat format.')
+    parser.add_argument('-n', '--count', type=int, default=10, help='number of puzzles (default: %(default)s)')
+    parser.add_argument('-b', '--box-size', type=int, default=3, help='box size (default: %(default)s)')
+    parser.add_argument('-d', '--difficulty', choices=GRADE_NAMES, help='grade of puzzle to generate')
+    parser.add_argument('--min-nodes', type=int, help='least search nodes the default solver may need')
+    parser.add_argument('--max-nodes', type=int, help='most search nodes the default solver may need')
+    parser.add_argument('--symmetric', action='store_true', help='remove clues in symmetric pairs')
+    parser.add_argument('--min-clues', type=int, default=0, help='stop removing clues at this many')
+    parser.add_argument('--seed', type=int, default=None, help='random seed, for repeatable runs')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('-o', '--output', help='file to write the puzzles to (default: standard output)')
+    args = parser.parse_args(args)
+    fout = open(args.output, 'w') if args.output else sys.stdout
+    results = generate_many(args.count, args.workers, args.seed, box_size=args.box_size,
+                            difficulty=args.difficulty, min_nodes=args.min_nodes, max_nodes=args.max_nodes,
+                            symmetric=args.symmetric, min_clues=args.min_clues)
+    for number, (puzzle, solution, puzzle_grade, nodes) in enumerate(results, 1):
+        clues = sum(1 for c in puzzle if c != '-')
+        write_dat_record(fout, puzzle, solution, 'Puzzle %d: %d clues, grade %s, %d search nodes'
+                         % (number, clues, puzzle_grade, nodes))
+    if fout is not sys.stdout:
+        fout.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# Sudoku Puzzle File Reader and Writer
+# Streams puzzles (and their answers, if given) out of puzzle files, and
+# writes them in the sudoku.dat format
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Two file formats are understood, and may be mixed in one file:
+# -- The sudoku.dat format: one row of the puzzle per line, optionally
+#    followed by the answer in the same layout (see sudokuEngTest.py)
+# -- The one line format: a whole puzzle on one line (81 characters for a
+#    9x9 puzzle, 256 for 16x16, ...), optionally followed by a separator
+#    (',', ':', ';', space or tab) and the answer
+# In both, blank lines and lines starting with '#' are skipped and empty
+# cells are '-', '_', '.' or '0' (or ' ', in the sudoku.dat format only).
+# A CSV header line at the start of the file is skipped too.
+
+from sudoku import Sudoku
+import mmap
+import re
+
+EMPTY_CELLS = '-_. 0'
+PACKED_MAGIC = b'SDKP' # The first bytes of a packed file (see sudokuPack.py)
+
+class PuzzleRecord(object):
+    """One puzzle read from a puzzle file.  The puzzle and answer are kept as
+    strings; Sudoku objects are only built when asked for.
+    Attributes:
+    puzzle: the puzzle as a single line string, one character per cell
+    answer: the answer in the same form, or None if the file has none
+    line: the line number of the file the puzzle starts on (the record
+          number, for a packed file)
+    error: why the puzzle could not be read, for a record yielded in its
+          place by read_puzzles(skip_errors=True) (puzzle and answer are
+          then None); else None
+    """
+    __slots__ = ('puzzle', 'answer', 'line', 'error')
+
+    def __init__(self, puzzle, answer=None, line=0, error=None):
+        self.puzzle = puzzle
+        self.answer = answer
+        self.line = line
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return 'PuzzleRecord(error=%r, line=%d)' % (self.error, self.line)
+        return 'PuzzleRecord(%r, %r, %d)' % (self.puzzle, self.answer, self.line)
+
+    def puzzle_sudoku(self):
+        """Return the puzzle as a Sudoku puzzle.  Raise ValueError (with
+        the line number) if it is not a legal puzzle."""
+        return self.build(self.puzzle)
+
+    def answer_sudoku(self):
+        """Return the answer as a Sudoku puzzle, or None if there is none"""
+        if self.answer is None:
+            return None
+        return self.build(self.answer)
+
+    def build(self, text):
+        try:
+            return Sudoku.from_string(text)
+        except ValueError as e:
+            raise ValueError('Puzzle at line %d: %s' % (self.line, e))
+
+def is_one_line_length(n):
+    """Return True if n cells is a whole puzzle of box_size 3 or more, which
+    is too long to be one row of a puzzle in the sudoku.dat format"""
+    box_size = int(round(n ** 0.25))
+    return box_size >= 3 and box_size**4 == n
+
+def is_square(n):
+    """Return True if n is a square of another number, False otherwise"""
+    return int(round(n ** 0.5))**2 == n
+
+_separator = re.compile('[,:; \t]')
+
+def read_puzzles(source, use_mmap=True, skip_errors=False):
+    """Yield a PuzzleRecord for each puzzle in source, which is either the
+    name of a puzzle file or an iterable of lines (such as an open file).
+    A named file is memory-mapped (unless use_mmap is False) and read a line
+    at a time, so files of any size are read in constant memory.  A named
+    packed file (see sudokuPack.py) is read with sudokuPack.PackedReader.
+    Raise ValueError, with the line number, at the first malformed
+    puzzle, or if skip_errors is True yield a record holding just the error
+    (see PuzzleRecord) in its place and carry on with the next line."""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            if f.read(4) == PACKED_MAGIC:
+                from sudokuPack import PackedReader
+                with PackedReader(source) as reader:
+                    for record in reader:
+                        yield record
+                return
+            f.seek(0)
+            if use_mmap:
+                try:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError: # An empty file cannot be mapped
+                    return
+                with mm:
+                    for record in parse_lines(iter(mm.readline, b''), skip_errors):
+                        yield record
+            else:
+                for record in parse_lines(f, skip_errors):
+                    yield record
+    else:
+        for record in parse_lines(source, skip_errors):
+            yield record
+
+def parse_lines(lines, skip_errors=False):
+    """Yield a PuzzleRecord for each puzzle in an iterable of lines (str or
+    bytes).  See read_puzzles."""
+    def error(message, line):
+        if not skip_errors:
+            raise ValueError(message)
+        return PuzzleRecord(None, None, line, message)
+    rows = []          # Rows of the sudoku.dat format grid being read
+    puzzle = None      # A sudoku.dat format puzzle waiting for its answer
+    puzzle_line = 0
+    line_count = 0
+    for line in lines:
+        line_count += 1
+        if isinstance(line, bytes):
+            line = line.decode('latin-1')
+        line = line.rstrip('\r\n')
+        if line == '' or line[0] == '#':
+            continue
+        first_field = _separator.split(line, 1)[0]
+        if line_count == 1 and ',' in line and not is_one_line_length(len(first_field)):
+            continue # A CSV header, such as 'quizzes,solutions'
+        if not rows and is_one_line_length(len(first_field)):
+            if puzzle is not None:
+                yield PuzzleRecord(puzzle, None, puzzle_line)
+                puzzle = None
+            try:
+                record = one_line_record(line, line_count)
+            except ValueError as e:
+                record = error(str(e), line_count)
+            yield record
+            continue
+        if not rows:
+            if not is_square(len(line)):
+                yield error('Line %d: Starting new puzzle, # of cell values not a square #' % line_count,
+                            line_count)
+                continue
+            grid_line = line_count
+        elif len(line) != len(rows[0]):
+            # The rows read so far are dropped along with this line
+            yield error('Line %d: Incorrect # of values: %d instead of expected %d'
+                        % (line_count, len(line), len(rows[0])), grid_line)
+            rows = []
+            continue
+        rows.append(line)
+        if len(rows) == len(rows[0]):
+            grid = ''.join(rows)
+            rows = []
+            if puzzle is None:
+                puzzle, puzzle_line = grid, grid_line
+            elif any(c in EMPTY_CELLS for c in grid):
+                # That was the next puzzle, not an answer to this one
+                yield PuzzleRecord(puzzle, None, puzzle_line)
+                puzzle, puzzle_line = grid, grid_line
+            else:
+                yield PuzzleRecord(puzzle, grid, puzzle_line)
+                puzzle = None
+    if rows:
+        yield error('Line %d: Puzzle ends after %d of %d rows' % (line_count, len(rows), len(rows[0])), grid_line)
+    if puzzle is not None:
+        yield PuzzleRecord(puzzle, None, puzzle_line)
+
+def one_line_record(line, line_count):
+    """Return the PuzzleRecord for a one line format puzzle"""
+    fields = [field for field in _separator.split(line) if field]
+    n = len(fields[0])
+    if len(fields) > 2 or (len(fields) == 2 and len(fields[1]) != n):
+        raise ValueError('Line %d: Expected a puzzle of %d cells and an optional answer' % (line_count, n))
+    return PuzzleRecord(fields[0], fields[1] if len(fields) == 2 else None, line_count)
+
+def write_grid(fout, text):
+    """Write a single line puzzle string to fout one row per line"""
+    max_val = int(round(len(text) ** 0.5))
+    for row in range(max_val):
+        fout.write(text[row*max_val:(row+1)*max_val] + '\n')
+
+def write_dat_record(fout, puzzle, answer=None, comment=None):
+    """Write a puzzle (and its answer, if given), as single line strings or
+    Sudoku puzzles, to fout in the sudoku.dat format, after a '#' comment
+    line if comment is given"""
+    if comment is not None:
+        fout.write('#\n# %s\n' % comment)
+    for grid in (puzzle, answer):
+        if grid is not None:
+            write_grid(fout, grid if isinstance(grid, str) else grid.to_string())
@@ -0,0 +1,203 @@
+# Sudoku NumPy Batch Engine
+# Propagates many same-sized Sudoku puzzles at once with NumPy array
+# operations, falling back to Sudoku.solve for puzzles that need search
+# Uses Python3, NumPy
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+
+from sudoku import Sudoku, index_tables
+import numpy as np
+
+def _popcount(masks):
+    """Return the number of bits set in each element of an array of masks"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks)
+    counts = np.zeros(masks.shape, dtype=np.uint8)
+    masks = masks.copy()
+    while masks.any():
+        counts += (masks & 1).astype(np.uint8)
+        masks >>= 1
+    return counts
+
+class SudokuBatch(object):
+    """A batch of same-sized Sudoku puzzles held as NumPy arrays, one row
+    per puzzle and one column per cell (row*max_val + col), like the flat
+    arrays of a single Sudoku puzzle.
+    Attributes:
+    box_size: the size of every puzzle in the batch (see Sudoku)
+    max_val: maximum numeric value of a cell (equals box_size squared)
+    values: an N x max_val**2 integer array of cell values (0 if empty)
+    possibles: an N x max_val**2 array of candidate bitmasks (bit value-1 is
+          set if value is still possible; 0 for filled cells)
+    failed: an N boolean array, True for puzzles found to be illegal or to
+          have no solution while propagating (they are left to Sudoku.solve
+          to report properly)
+    searched: an N boolean array, True for puzzles that needed search and
+          were finished by Sudoku.solve
+    errors: a dictionary of error messages by puzzle: from Sudoku.solve, or
+          for puzzles of the wrong size for the batch (which are not solved)
+    """
+    def __init__(self, puzzles, box_size=3):
+        self.box_size = box_size
+        self.max_val = box_size**2
+        n2 = self.max_val**2
+        if self.max_val <= 16:
+            self.dtype = np.uint16
+        elif self.max_val <= 32:
+            self.dtype = np.uint32
+        else:
+            self.dtype = np.uint64
+        texts = [p if isinstance(p, str) else p.to_string() for p in puzzles]
+        self.texts = texts
+        count = len(texts)
+        self.failed = np.zeros(count, dtype=bool)
+        self.searched = np.zeros(count, dtype=bool)
+        self.errors = {}
+        # Map every character to its value with a lookup table; anything
+        # that is not a legal value marks the puzzle as failed
+        parser = Sudoku(box_size)
+        table = np.zeros(256, dtype=np.int64)
+        for code in range(256):
+            try:
+                table[code] = parser.char2value(chr(code))
+            except ValueError: # Numeric characters such as superscripts
+                table[code] = self.max_val + 1
+        chars = np.zeros((count, n2), dtype=np.uint8)
+        for i, text in enumerate(texts):
+            if len(text) == n2:
+                chars[i] = np.frombuffer(text.encode('latin-1', 'replace'), dtype=np.uint8)
+            else:
+                self.failed[i] = True
+                self.errors[i] = 'Puzzle has %d cells, not the %d of this batch' % (len(text), n2)
+        self.values = table[chars]
+        self.failed |= (self.values > self.max_val).any(axis=1)
+        self.values[self.failed] = 0
+        self.possibles = np.where(self.values == 0, self.dtype((1 << self.max_val) - 1),
+                                  self.dtype(0)).astype(self.dtype)
+        tables = index_tables(box_size)
+        self.units = np.array(tables.units)                      # units x max_val
+        cell_units = [[] for i in range(n2)]
+        for u, unit in enumerate(tables.units):
+            for i in unit:
+                cell_units[i].append(u)
+        self.cell_units = np.array(cell_units)                   # cells x 3
+
+    def __len__(self):
+        return len(self.texts)
+
+    def value_bits(self):
+        """Return the candidate bit of each cell's value (0 if empty)"""
+        values = self.values
+        return np.where(values > 0, np.left_shift(1, np.maximum(values, 1) - 1), 0).astype(self.dtype)
+
+    def eliminate(self):
+        """Remove the values already placed in each unit from the candidates
+        of the unit's other cells, and mark puzzles with a value twice in a
+        unit or an empty cell with no candidates as failed"""
+        bits = self.value_bits()
+        unit_bits = bits[:, self.units]                          # N x units x max_val
+        placed = np.bitwise_or.reduce(unit_bits, axis=2)         # N x units
+        counts = (unit_bits != 0).sum(axis=2)
+        self.failed |= (_popcount(placed) != counts).any(axis=1)
+        peers = np.bitwise_or.reduce(placed[:, self.cell_units], axis=2)
+        self.possibles &= ~peers
+        self.failed |= ((self.values == 0) & (self.possibles == 0)).any(axis=1)
+
+    def hidden_singles(self):
+        """For each unit, find the values possible in only one of its cells
+        and remove every other candidate from that cell"""
+        unit_masks = self.possibles[:, self.units]               # N x units x max_val
+        once = np.zeros(unit_masks.shape[:2], dtype=self.dtype)
+        twice = np.zeros_like(once)
+        for k in range(self.max_val):
+            twice |= once & unit_masks[:, :, k]
+            once |= unit_masks[:, :, k]
+        hidden = once & ~twice
+        cell_hidden = np.bitwise_or.reduce(hidden[:, self.cell_units], axis=2) & self.possibles
+        found = cell_hidden != 0
+        self.possibles = np.where(found, cell_hidden, self.possibles)
+        # A cell that is the only place for two values is a contradiction
+        self.failed |= (found & (_popcount(cell_hidden) > 1)).any(axis=1)
+
+    def naked_singles(self):
+        """Fill in every empty cell that has exactly one candidate.  Return
+        the number of cells filled in."""
+        single = (self.values == 0) & (_popcount(self.possibles) == 1)
+        single &= ~self.failed[:, None]
+        filled = int(single.sum())
+        if filled:
+            self.values = np.where(single, np.log2(np.maximum(self.possibles, 1)).astype(np.int64) + 1,
+                                   self.values)
+            self.possibles = np.where(single, self.dtype(0), self.possibles)
+        return filled
+
+    def propagate(self, hidden_singles=True):
+        """Fill in naked singles (and hidden singles, if hidden_singles is
+        True) across the whole batch until no puzzle makes more progress"""
+        while True:
+            self.eliminate()
+            if hidden_singles:
+                self.hidden_singles()
+            if not self.naked_singles():
+                self.eliminate()
+                return
+
+    def solved(self):
+        """Return an N boolean array, True for each solved puzzle"""
+        return ~self.failed & (self.values != 0).all(axis=1)
+
+    def solve(self, hidden_singles=True, **options):
+        """Propagate the whole batch, then finish every puzzle that is not
+        solved (or that failed) with Sudoku.solve, passing on options.
+        Puzzles with no solution, or of the wrong size, are left failed."""
+        self.propagate(hidden_singles)
+        for i in np.flatnonzero(~self.solved()):
+            if int(i) in self.errors:
+                continue
+            self.searched[i] = True
+            try:
+                start = self.texts[i] if self.failed[i] else self.sudoku(i, propagated=True)
+                if isinstance(start, str):
+                    start = Sudoku.from_string(start)
+                solution = start.solve(**options)
+            except ValueError as e:
+                self.errors[int(i)] = str(e)
+                solution = None
+            if solution is None:
+                self.failed[i] = True
+            else:
+                self.failed[i] = False
+                self.values[i] = solution.values
+                self.possibles[i] = 0
+        return self
+
+    def sudoku(self, i, propagated=False):
+        """Return puzzle i as a Sudoku puzzle, or None if it failed.
+        Solved puzzles are copied straight in; others are filled in through
+        set_cell."""
+        if self.failed[i] and not propagated:
+            return None
+        puzzle = Sudoku(self.box_size)
+        values = self.values[i].tolist()
+        if 0 not in values:
+            puzzle.values = values
+            puzzle.possibles = [0] * len(values)
+            puzzle.cells_filled = len(values)
+            return puzzle
+        for index, value in enumerate(values):
+            if value:
+                puzzle.set_cell(value, *divmod(index, self.max_val))
+        return puzzle
+
+    def solutions(self):
+        """Yield each puzzle of the batch as a Sudoku puzzle (None for
+        puzzles with no solution)"""
+        for i in range(len(self)):
+            yield self.sudoku(i)
+
+def solve_batch(puzzles, box_size=3, **options):
+    """Solve a list of same-sized puzzles (Sudoku puzzles or single line
+    strings) and return a list of their solutions as Sudoku puzzles, None
+    for each puzzle with no solution or not of the given box_size"""
+    return list(SudokuBatch(puzzles, box_size).solve(**options).solutions())
@@ -0,0 +1,218 @@
+# Sudoku Packed Puzzle Files
+# A compact binary file format for large puzzle corpora, with an index so
+# any puzzle can be read directly, and a converter from the text formats
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuPack.py puzzle_file packed_file
+# Converts a puzzle file (sudoku.dat or one line format, see sudokuIO.py)
+# to a packed file.  sudokuIO.read_puzzles reads packed files too.
+#
+# File layout (all integers little-endian):
+# -- Header, 24 bytes: the magic bytes b'SDKP', the format version (32
+#    bits), the number of records (64 bits) and the offset of the index
+#    from the start of the file (64 bits)
+# -- Records, one per puzzle: the box_size (one byte), flags (one byte:
+#    1 if an answer follows), then the puzzle's cells, then the answer's
+#    cells if there is one.  Cells are packed bits bits each, where bits is
+#    the bit length of max_val (4 for 9x9, 5 for 16x16 and 25x25, 6 for
+#    36x36), the first cell in the lowest bits, 0 for an empty cell; each
+#    grid is padded to a whole number of bytes.
+# -- Index, 8 byte aligned: number of records + 1 offsets (64 bits each),
+#    the start of each record then the end of the last one
+
+from sudoku import Sudoku, values2string
+from sudokuIO import PACKED_MAGIC, PuzzleRecord, read_puzzles
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ')
+HAS_ANSWER = 1
+
+def cell_bits(box_size):
+    """Return the number of bits each cell of a puzzle of box_size takes"""
+    return (box_size**2).bit_length()
+
+def grid_bytes(box_size):
+    """Return the number of bytes a packed grid of box_size takes"""
+    return (box_size**4 * cell_bits(box_size) + 7) // 8
+
+def pack_grid(values, box_size):
+    """Return the bytes of a flat list of cell values, packed"""
+    bits = cell_bits(box_size)
+    packed = 0
+    for value in reversed(values):
+        packed = (packed << bits) | value
+    return packed.to_bytes(grid_bytes(box_size), 'little')
+
+def unpack_grid(data, box_size):
+    """Return the flat list of cell values packed in data"""
+    bits = cell_bits(box_size)
+    mask = (1 << bits) - 1
+    packed = int.from_bytes(data, 'little')
+    values = []
+    for i in range(box_size**4):
+        values.append(packed & mask)
+        packed >>= bits
+    return values
+
+class PackedWriter(object):
+    """Writes a packed puzzle file.  Use as a context manager, or call
+    close() to write the index and header once every puzzle is written.
+    Attributes:
+    fout: the file being written
+    offsets: the offset of each record written so far
+    """
+    def __init__(self, path):
+        self.fout = open(path, 'wb')
+        self.fout.write(HEADER.pack(PACKED_MAGIC, VERSION, 0, 0)) # Filled in by close
+        self.offsets = []
+        self.parsers = {} # box_size -> Sudoku, for its char2value
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def grid_values(self, grid):
+        """Return the box_size and flat cell values of a single line string
+        or Sudoku puzzle"""
+        if isinstance(grid, Sudoku):
+            return grid.box_size, grid.values
+        box_size = int(round(len(grid) ** 0.25))
+        if box_size < 1 or box_size**4 != len(grid):
+            raise ValueError('A puzzle of %d cells is not square' % len(grid))
+        if box_size not in self.parsers:
+            self.parsers[box_size] = Sudoku(box_size)
+        parser = self.parsers[box_size]
+        values = [parser.char2value(c) for c in grid]
+        if max(values) > parser.max_val:
+            raise ValueError('A puzzle of box size %d cannot hold the value %s'
+                             % (box_size, grid[values.index(max(values))]))
+        return box_size, values
+
+    def write(self, puzzle, answer=None):
+        """Add a puzzle, and its answer if given, each a single line string
+        or a Sudoku puzzle"""
+        box_size, values = self.grid_values(puzzle)
+        data = [bytes([box_size, HAS_ANSWER if answer is not None else 0]), pack_grid(values, box_size)]
+        if answer is not None:
+            answer_size, answer_values = self.grid_values(answer)
+            if answer_size != box_size:
+                raise ValueError('The answer is not the same size as the puzzle')
+            data.append(pack_grid(answer_values, box_size))
+        self.offsets.append(self.fout.tell())
+        self.fout.write(b''.join(data))
+
+    def close(self):
+        if self.fout is None:
+            return
+        end = self.fout.tell()
+        self.fout.write(b'\0' * (-end % 8))
+        index_offset = self.fout.tell()
+        self.fout.write(struct.pack('<%dQ' % (len(self.offsets)+1), *(self.offsets + [end])))
+        self.fout.seek(0)
+        self.fout.write(HEADER.pack(PACKED_MAGIC, VERSION, len(self.offsets), index_offset))
+        self.fout.close()
+        self.fout = None
+
+class PackedReader(object):
+    """Reads a packed puzzle file, which is memory-mapped: reader[i] decodes
+    puzzle i straight from the mapped file, without reading or copying any
+    other part of it, so a worker can take any range of puzzles cheaply.
+    Attributes:
+    mm: the memory-mapped file
+    view: a memoryview of mm, which grids are decoded from in place
+    count: the number of puzzles in the file
+    index_offset: the offset of the index in the file
+    """
+    def __init__(self, path):
+        self.mm = self.view = None
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError('%s is not a packed puzzle file' % path)
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.index_offset = HEADER.unpack_from(self.mm)
+        if magic != PACKED_MAGIC:
+            self.close()
+            raise ValueError('%s is not a packed puzzle file' % path)
+        if version != VERSION:
+            self.close()
+            raise ValueError('%s is packed puzzle file version %d, not %d' % (path, version, VERSION))
+        self.view = memoryview(self.mm)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.view is not None:
+            self.view.release() # The map cannot be closed while viewed
+            self.view = None
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        """Return puzzle i (0 for the first) as a PuzzleRecord, whose line
+        is the record number, counting from 1"""
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError('Puzzle %d is not in the file' % i)
+        start = struct.unpack_from('<Q', self.mm, self.index_offset + 8*i)[0]
+        box_size, flags = self.mm[start], self.mm[start+1]
+        size = grid_bytes(box_size)
+        start += 2
+        puzzle = values2string(unpack_grid(self.view[start:start+size], box_size))
+        answer = None
+        if flags & HAS_ANSWER:
+            start += size
+            answer = values2string(unpack_grid(self.view[start:start+size], box_size))
+        return PuzzleRecord(puzzle, answer, i+1)
+
+    def records(self, start=0, stop=None):
+        """Yield the PuzzleRecord of each puzzle from start up to (not
+        including) stop, None for the end of the file"""
+        if stop is None or stop > self.count:
+            stop = self.count
+        for i in range(start, stop):
+            yield self[i]
+
+    def __iter__(self):
+        return self.records()
+
+def convert(source, path):
+    """Write every puzzle (and answer) read from source, a puzzle file name
+    or an iterable of lines (see sudokuIO.read_puzzles), to a packed file
+    at path.  Return the number of puzzles written."""
+    with PackedWriter(path) as writer:
+        for record in read_puzzles(source):
+            try:
+                writer.write(record.puzzle, record.answer)
+            except ValueError as e:
+                raise ValueError('Puzzle at line %d: %s' % (record.line, e))
+        return len(writer.offsets)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Convert a puzzle file to the packed binary format.')
+    parser.add_argument('puzzle_file', help='puzzle file (sudoku.dat or one puzzle per line)')
+    parser.add_argument('packed_file', help='packed file to write')
+    args = parser.parse_args(args)
+    count = convert(args.puzzle_file, args.packed_file)
+    print('Wrote %d puzzles to %s' % (count, args.packed_file))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# Sudoku Packed Puzzle File Tests
+# Checks that puzzles written by sudokuPack.py read back unchanged
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuPackTest.py
+
+from sudoku import *
+from sudokuBench import HARD_PUZZLES, SIXTEEN_PUZZLES, TWENTY_FIVE_PUZZLES
+from sudokuIO import read_puzzles
+from sudokuPack import PACKED_MAGIC, PackedReader, PackedWriter, pack_grid, unpack_grid
+import os
+import shutil
+import tempfile
+import unittest
+
+PUZZLES = HARD_PUZZLES[:2] + SIXTEEN_PUZZLES[:2] + TWENTY_FIVE_PUZZLES[:2]
+
+class TestPacking(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'puzzles.sdkp')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_grids(self):
+        for text in PUZZLES:
+            for puzzle in (Sudoku.from_string(text), Sudoku.from_string(text).solve()):
+                packed = pack_grid(puzzle.values, puzzle.box_size)
+                self.assertEqual(unpack_grid(packed, puzzle.box_size), puzzle.values)
+
+    def test_round_trip(self):
+        # Puzzles of every size, with and without answers, in one file
+        records = []
+        for i, text in enumerate(PUZZLES):
+            answer = Sudoku.from_string(text).solve().to_string() if i % 2 == 0 else None
+            records.append((Sudoku.from_string(text).to_string(), answer))
+        with PackedWriter(self.path) as writer:
+            for puzzle, answer in records:
+                writer.write(puzzle, answer)
+        with PackedReader(self.path) as reader:
+            self.assertEqual(len(reader), len(records))
+            self.assertEqual([(r.puzzle, r.answer) for r in reader], records)
+            self.assertEqual(reader[-1].puzzle, records[-1][0])
+            self.assertEqual([r.line for r in reader.records(2, 4)], [3, 4])
+            self.assertRaises(IndexError, reader.__getitem__, len(records))
+        self.assertEqual([(r.puzzle, r.answer) for r in read_puzzles(self.path)], records)
+
+    def test_short_file(self):
+        with open(self.path, 'wb') as fout:
+            fout.write(PACKED_MAGIC + b'\1\0')
+        self.assertRaises(ValueError, PackedReader, self.path)
+        self.assertRaises(ValueError, list, read_puzzles(self.path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+# Sudoku Parallel Search
+# Solves a single hard puzzle by searching its subtrees in a pool of
+# worker processes, which hand unexplored subtrees to idle workers
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuParallel.py [options] puzzle_file
+# Run with --help for the list of options.
+
+from sudoku import *
+from sudokuIO import read_puzzles, write_grid
+import argparse
+import multiprocessing
+import queue
+import sys
+import time
+
+POLL_SECONDS = 0.5 # How often the master checks that the workers are alive
+
+def split_tree(puzzle, strategies, count):
+    """Expand the search tree of puzzle breadth first until there are at
+    least count subproblems (or nothing left to expand).  Return (solution,
+    subproblems): solution is a solved Sudoku puzzle if one turned up while
+    expanding, else None, and subproblems is a list of single line puzzle
+    strings which between them cover every solution."""
+    frontier = [puzzle.copy()]
+    while frontier and len(frontier) < count:
+        subproblem = frontier.pop(0)
+        subproblem.propagate(strategies)
+        if subproblem.solved():
+            return subproblem, []
+        if subproblem.reached_dead_end():
+            continue
+        row, col = subproblem.find_lowest_possibles()
+        for value in mask2values(subproblem.possibles[row*subproblem.max_val + col]):
+            child = subproblem.copy()
+            child.set_cell(value, row, col)
+            frontier.append(child)
+    return None, [values2string(p.values) for p in frontier]
+
+def donate(state, clues):
+    """Take the untried values of the shallowest open branch point of a
+    SearchState away from it and return them as subproblems (single line
+    puzzle strings) for other workers: each is the clues, plus the values
+    chosen at the branch points above, plus one untried value.  Return an
+    empty list if no branch point has untried values."""
+    puzzle = state.puzzle
+    for level, (checkpoint, row, col, untried) in enumerate(state.branches):
+        if untried:
+            break
+    else:
+        return []
+    values = clues[:]
+    for checkpoint, r, c, u in state.branches[:level]:
+        index = r*puzzle.max_val + c
+        values[index] = puzzle.values[index]
+    index = row*puzzle.max_val + col
+    subproblems = []
+    for value in mask2values(untried):
+        values[index] = value
+        subproblems.append(values2string(values))
+    state.branches[level][3] = 0
+    return subproblems
+
+def worker(tasks, results, idle, stop, strategies, slice_nodes):
+    """Body of a worker process: search each subproblem taken from tasks a
+    slice at a time, giving away the shallowest untried subtrees (through
+    results, to the master) whenever another worker is idle, and stopping
+    once stop is set.  Messages to results are ('tasks', subproblems),
+    ('done', nodes) and ('solution', solution string, nodes)."""
+    strategies = find_strategies(strategies)
+    while True:
+        with idle.get_lock():
+            idle.value += 1
+        task = tasks.get()
+        with idle.get_lock():
+            idle.value -= 1
+        if task is None:
+            return
+        try:
+            puzzle = Sudoku.from_string(task)
+        except ValueError: # A subproblem that breaks the rules has no solution
+            results.put(('done', 0))
+            continue
+        clues = puzzle.values[:]
+        state = SearchState(puzzle, strategies)
+        status = state.status
+        while not stop.is_set():
+            status = state.run(slice_nodes)
+            if status == 'solved':
+                results.put(('solution', state.puzzle.to_string(), state.nodes))
+                break
+            if status == 'done':
+                break
+            if idle.value > 0:
+                subproblems = donate(state, clues)
+                if subproblems:
+                    results.put(('tasks', subproblems))
+        if status != 'solved':
+            results.put(('done', state.nodes))
+
+def solve_parallel(puzzle, workers=None, strategies=None, tasks_per_worker=4, slice_nodes=100):
+    """Return a solved copy of puzzle, or None if it has no solution,
+    searching with a pool of workers processes (None for one per CPU; 0 or
+    1 just calls puzzle.solve).  The top of the search tree is split into
+    about tasks_per_worker subproblems per worker; a worker searches
+    slice_nodes nodes between checks for idle workers to give work to.
+    Every worker is stopped as soon as one finds a solution.  The total
+    number of search nodes is left in puzzle.nodes.  Raise RuntimeError if
+    a worker process dies (its subtrees would never be searched)."""
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 1:
+        return puzzle.solve(strategies=strategies, engine='search')
+    functions = find_strategies(strategies)
+    solution, subproblems = split_tree(puzzle, functions, workers*tasks_per_worker)
+    puzzle.nodes = 0
+    if solution is not None or not subproblems:
+        return solution
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    idle = multiprocessing.Value('i', 0)
+    stop = multiprocessing.Event()
+    for subproblem in subproblems:
+        tasks.put(subproblem)
+    processes = [multiprocessing.Process(target=worker, args=(tasks, results, idle, stop, strategies, slice_nodes),
+                                         daemon=True) for i in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        outstanding = len(subproblems)
+        while outstanding:
+            try:
+                message = results.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                for process in processes:
+                    if not process.is_alive():
+                        raise RuntimeError('Worker process %d died (exit code %s)'
+                                           % (process.pid, process.exitcode))
+                continue
+            if message[0] == 'tasks':
+                for subproblem in message[1]:
+                    tasks.put(subproblem)
+                outstanding += len(message[1])
+            elif message[0] == 'done':
+                puzzle.nodes += message[1]
+                outstanding -= 1
+            else:
+                puzzle.nodes += message[2]
+                solution = Sudoku.from_string(message[1])
+                break
+    finally:
+        stop.set()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+    return solution
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Solve each puzzle in a puzzle file with a parallel search.')
+    parser.add_argument('puzzle_file', help='puzzle file (sudoku.dat or one puzzle per line)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('--strategies', default=None,
+                        help='comma separated propagation strategies (default: %s)' % ','.join(DEFAULT_STRATEGIES))
+    parser.add_argument('--slice-nodes', type=int, default=100,
+                        help='search nodes between checks for idle workers (default: %(default)s)')
+    args = parser.parse_args(args)
+    strategies = None if args.strategies is None else [s for s in args.strategies.split(',') if s]
+    failures = 0
+    for number, record in enumerate(read_puzzles(args.puzzle_file), 1):
+        start = time.perf_counter()
+        puzzle = record.puzzle_sudoku()
+        solution = solve_parallel(puzzle, args.workers, strategies, slice_nodes=args.slice_nodes)
+        print('# Puzzle %d: %s in %.3f s, %d nodes' % (number, 'solved' if solution else 'no solution',
+                                                     time.perf_counter() - start, puzzle.nodes))
+        if solution is None:
+            failures += 1
+        else:
+            write_grid(sys.stdout, solution.to_string())
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
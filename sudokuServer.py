@@ -0,0 +1,350 @@
+# Sudoku Solving Service
+# A local HTTP server answering JSON requests to solve, count the solutions
+# of and validate Sudoku puzzles.  Requests are grouped into small batches
+# and each request in a batch is solved on its own by a persistent pool of
+# worker processes, so one slow request does not hold up the others.
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuServer.py [--host 127.0.0.1] [--port 8765] [options]
+# Run with --help for the list of options.
+#
+# Endpoints (puzzles are single line strings, as from Sudoku.to_string):
+# -- POST /solve     {"puzzle": "...", "timeout": 5, "strategies": [...]}
+#    -> {"status": "solved", "solution": "...", "nodes": 12, "seconds": ...}
+#       status is "solved", "no solution" or "timeout" (HTTP 504)
+# -- POST /count     {"puzzle": "...", "limit": 2, "timeout": 5}
+#    -> {"status": "counted", "count": 1, "unique": true, ...}
+#       counting stops at limit solutions (default 2, enough for "unique")
+# -- POST /validate  {"puzzle": "..."}
+#    -> {"valid": true, "filled": 30, "solved": false}, or "valid": false
+#       and an "error" message.  Answered straight away, not batched.
+# -- GET /metrics    throughput, latency percentiles, batch sizes, queue
+#    depth and counts of requests and responses
+# A request that cannot be queued because the server is busy gets HTTP 503.
+# A bad request gets HTTP 400, and a failure in the solver processes HTTP
+# 500, with an "error" message; either only affects that one request.
+
+from sudoku import *
+from sudokuBench import percentile
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import concurrent.futures.process
+import http
+import json
+import os
+import sys
+import time
+
+MAX_BODY = 1 << 20 # Largest request body accepted, in bytes
+
+def run_job(job):
+    """Run one solve or count job in a worker process and return its
+    result as a dictionary.  job is (kind, puzzle string, options,
+    deadline), deadline being a time.time() value shared by all processes.
+    Never raises: errors are reported in the result, with status 'error'
+    for a puzzle or option that is not legal and 'failed' for anything
+    else, so one bad job cannot break a worker."""
+    kind, text, options, deadline = job
+    start = time.perf_counter()
+    try:
+        puzzle = Sudoku.from_string(text)
+        strategies = find_strategies(options.get('strategies'))
+        timeout = deadline - time.time()
+        if timeout <= 0:
+            return {'status': 'timeout', 'error': 'Timed out waiting to be solved'}
+        if kind == 'solve':
+            try:
+                solution = puzzle.solve(strategies=strategies, timeout=timeout)
+            except SolveLimitReached:
+                return {'status': 'timeout', 'nodes': puzzle.nodes, 'seconds': time.perf_counter() - start}
+            result = {'status': 'no solution' if solution is None else 'solved',
+                      'solution': None if solution is None else solution.to_string()}
+        else:
+            limit = options.get('limit', 2)
+            state = SearchState(puzzle, strategies)
+            count = 0
+            while count != limit and state.run(deadline=start + timeout) == 'solved':
+                count += 1
+            if state.status == 'paused':
+                return {'status': 'timeout', 'count': count, 'nodes': state.nodes,
+                        'seconds': time.perf_counter() - start}
+            result = {'status': 'counted', 'count': count, 'unique': count == 1,
+                      'complete': state.status == 'done'}
+    except ValueError as e:
+        return {'status': 'error', 'error': str(e)}
+    except Exception as e:
+        return {'status': 'failed', 'error': '%s: %s' % (type(e).__name__, e)}
+    result['nodes'] = puzzle.nodes
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def validate(text):
+    """Return the /validate result for a puzzle string"""
+    try:
+        puzzle = Sudoku.from_string(text)
+    except ValueError as e:
+        return {'valid': False, 'error': str(e)}
+    return {'valid': True, 'filled': puzzle.cells_filled, 'solved': puzzle.solved()}
+
+class SolverService(object):
+    """The solving service: an asyncio HTTP server in front of a pool of
+    solver processes.  Requests to /solve and /count wait on a bounded
+    queue; a batcher task takes up to batch_size of them at a time (waiting
+    at most batch_wait seconds to fill a batch) and hands each job of the
+    batch to the pool on its own as soon as a worker is free, so a job
+    never waits behind a slower one while another worker is idle.
+    Batching only saves work in the batcher.
+    Attributes:
+    workers: number of solver processes
+    batch_size: most jobs taken from the queue at once
+    batch_wait: longest wait, in seconds, for a batch to fill
+    timeout: longest time, in seconds, a request may take (requests may
+          ask for less)
+    queue: the asyncio.Queue of (job, future) pairs waiting to be batched;
+          when it is full new requests are turned away with HTTP 503
+    pool: the concurrent.futures.ProcessPoolExecutor of solver processes,
+          replaced by a new one if a process dies
+    slots: an asyncio.Semaphore limiting the jobs in flight to one per
+          worker, so waiting jobs stay in the queue
+    started: the time.perf_counter() time the service started
+    counts: counts by name for the metrics: requests by endpoint,
+          responses by HTTP status, batches and jobs batched
+    latencies: the response times, in seconds, of recent requests
+    """
+    def __init__(self, workers=None, batch_size=16, batch_wait=0.002, queue_size=1000, timeout=10.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self.queue = None
+        self.pool = None
+        self.slots = None
+        self.tasks = set()
+        self.started = time.perf_counter()
+        self.counts = collections.Counter()
+        self.latencies = collections.deque(maxlen=10000)
+
+    async def serve(self, host='127.0.0.1', port=8765, ready=None):
+        """Run the service until cancelled.  ready, if given, is called
+        with the asyncio server once it is listening."""
+        self.queue = asyncio.Queue(self.queue_size)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+        self.started = time.perf_counter()
+        batcher = asyncio.ensure_future(self.batcher())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        try:
+            if ready is not None:
+                ready(server)
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            end = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = end - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self.counts['batches'] += 1
+            self.counts['batched jobs'] += len(batch)
+            for job, future in batch:
+                await self.slots.acquire()
+                if future.done(): # The request has already timed out
+                    self.slots.release()
+                    continue
+                task = asyncio.ensure_future(self.run(job, future))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def run(self, job, future):
+        """Solve one job in the pool and hand the result to its request"""
+        pool = self.pool
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, run_job, job)
+        except Exception as e:
+            result = {'status': 'failed', 'error': '%s: %s' % (type(e).__name__, e)}
+            if isinstance(e, concurrent.futures.process.BrokenProcessPool) and pool is self.pool:
+                # A dead worker breaks the whole pool; start a new one for
+                # the jobs still to come
+                self.counts['pool restarts'] += 1
+                self.pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+                pool.shutdown(wait=False)
+        finally:
+            self.slots.release()
+        if not future.done():
+            future.set_result(result)
+
+    async def submit(self, kind, request):
+        """Queue a solve or count request and return (HTTP status, result)"""
+        text = request.get('puzzle')
+        if not isinstance(text, str):
+            return 400, {'error': 'Expected a "puzzle" string'}
+        try:
+            timeout = min(float(request.get('timeout', self.timeout)), self.timeout)
+        except (TypeError, ValueError):
+            return 400, {'error': 'Expected a number of seconds for "timeout"'}
+        options = {}
+        if request.get('strategies') is not None:
+            strategies = request['strategies']
+            if not isinstance(strategies, list) or \
+               not all(isinstance(s, str) and s in STRATEGIES for s in strategies):
+                return 400, {'error': 'Expected "strategies" to be a list of names from: '
+                                      + ', '.join(STRATEGIES)}
+            options['strategies'] = strategies
+        if kind == 'count':
+            limit = request.get('limit', 2)
+            if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+                return 400, {'error': 'Expected a non-negative integer "limit"'}
+            options['limit'] = limit
+        if self.queue.full():
+            return 503, {'error': 'Server busy, try again later'}
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(((kind, text, options, time.time() + timeout), future))
+        try:
+            # Allow a little longer than the job's own deadline, so a job
+            # that stops at its deadline still gets to report how far it got
+            result = await asyncio.wait_for(future, timeout + 1.0)
+        except asyncio.TimeoutError:
+            return 504, {'status': 'timeout', 'error': 'Timed out'}
+        if result['status'] == 'timeout':
+            return 504, result
+        if result['status'] == 'error':
+            return 400, result
+        if result['status'] == 'failed':
+            return 500, result
+        return 200, result
+
+    async def route(self, method, path, body):
+        """Return (HTTP status, result) for a request"""
+        endpoints = {'/solve': 'POST', '/count': 'POST', '/validate': 'POST', '/metrics': 'GET'}
+        if path not in endpoints:
+            return 404, {'error': 'No such endpoint: ' + path}
+        if method != endpoints[path]:
+            return 405, {'error': 'Use %s for %s' % (endpoints[path], path)}
+        self.counts['requests ' + path] += 1
+        if path == '/metrics':
+            return 200, self.metrics()
+        try:
+            request = json.loads(body.decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            return 400, {'error': 'Request body is not valid JSON'}
+        if not isinstance(request, dict):
+            return 400, {'error': 'Expected a JSON object'}
+        if path == '/validate':
+            if not isinstance(request.get('puzzle'), str):
+                return 400, {'error': 'Expected a "puzzle" string'}
+            return 200, validate(request['puzzle'])
+        return await self.submit(path[1:], request)
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until it is closed"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                start = time.perf_counter()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, sep, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                parts = line.decode('latin-1').split()
+                keep_alive = len(parts) == 3 and parts[2] == 'HTTP/1.1' and \
+                    headers.get('connection', '').lower() != 'close'
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if len(parts) != 3 or length < 0:
+                    status, result, keep_alive = 400, {'error': 'Malformed request'}, False
+                elif length > MAX_BODY:
+                    status, result, keep_alive = 413, {'error': 'Request body too large'}, False
+                else:
+                    body = await reader.readexactly(length)
+                    status, result = await self.route(parts[0], parts[1].split('?')[0], body)
+                self.counts['responses %d' % status] += 1
+                self.latencies.append(time.perf_counter() - start)
+                data = json.dumps(result).encode('utf-8')
+                writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n'
+                              'Content-Length: %d\r\nConnection: %s\r\n\r\n'
+                              % (status, http.HTTPStatus(status).phrase, len(data),
+                                 'keep-alive' if keep_alive else 'close')).encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass # The service is stopping; just close the connection
+        finally:
+            writer.close()
+
+    def metrics(self):
+        """Return the service metrics as a dictionary"""
+        uptime = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        responses = sum(n for name, n in self.counts.items() if name.startswith('responses '))
+        return {
+            'uptime': uptime,
+            'workers': self.workers,
+            'requests': {name[9:]: n for name, n in self.counts.items() if name.startswith('requests ')},
+            'responses': {name[10:]: n for name, n in self.counts.items() if name.startswith('responses ')},
+            'responses_per_sec': responses / uptime if uptime else 0.0,
+            'latency': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else 0.0,
+            },
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'jobs_in_flight': len(self.tasks),
+            'batches': self.counts['batches'],
+            'pool_restarts': self.counts['pool restarts'],
+            'mean_batch_size': float(self.counts['batched jobs']) / self.counts['batches']
+                               if self.counts['batches'] else 0.0,
+        }
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Serve Sudoku solving over HTTP/JSON on this machine.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on (default: %(default)s)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of solver processes (default: one per CPU)')
+    parser.add_argument('--batch-size', type=int, default=16, help='most requests per batch (default: %(default)s)')
+    parser.add_argument('--batch-wait', type=float, default=2.0,
+                        help='longest wait for a batch to fill, in milliseconds (default: %(default)s)')
+    parser.add_argument('--queue-size', type=int, default=1000,
+                        help='most requests waiting before new ones get HTTP 503 (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=10.0,
+                        help='longest time a request may take, in seconds (default: %(default)s)')
+    args = parser.parse_args(args)
+    service = SolverService(args.workers, args.batch_size, args.batch_wait / 1000.0, args.queue_size, args.timeout)
+    def ready(server):
+        print('Serving on http://%s:%d/' % server.sockets[0].getsockname()[:2])
+        sys.stdout.flush()
+    try:
+        asyncio.run(service.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# Sudoku Solving Service Tester
+# Starts the solving service (sudokuServer.py) on a free localhost port and
+# checks its endpoints over HTTP
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuServerTest.py
+
+from sudoku import *
+from sudokuServer import SolverService, run_job
+import asyncio
+import http.client
+import json
+import os
+import signal
+import threading
+import time
+import unittest
+
+PUZZLE = '4-----8-5-3----------7------2-----6-----8-4------1-------6-3-7-5--2-----1-4------'
+EMPTY = '-' * 81
+
+class ServiceThread(object):
+    """A SolverService running in its own event loop on a background thread,
+    listening on a free port of 127.0.0.1"""
+    def __init__(self, **options):
+        self.service = SolverService(**options)
+        self.port = None
+        self.listening = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        if not self.listening.wait(30):
+            raise RuntimeError('Service did not start')
+
+    def run(self):
+        def ready(server):
+            self.port = server.sockets[0].getsockname()[1]
+            self.listening.set()
+        asyncio.set_event_loop(self.loop)
+        self.task = self.loop.create_task(self.service.serve('127.0.0.1', 0, ready))
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join(30)
+
+    def request(self, method, path, body=None):
+        """Send one request and return (HTTP status, decoded JSON result)"""
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        try:
+            data = None if body is None else json.dumps(body)
+            connection.request(method, path, data, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            return response.status, json.loads(response.read().decode('utf-8'))
+        finally:
+            connection.close()
+
+    def requests(self, calls):
+        """Send (method, path, body) requests all at once, from a thread
+        each, and return their (HTTP status, result) pairs in order"""
+        results = [None] * len(calls)
+        def send(i):
+            results[i] = self.request(*calls[i])
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(len(calls))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+class TestEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # A long batch_wait, so requests sent together share a batch
+        cls.server = ServiceThread(workers=2, batch_wait=0.2, timeout=10.0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_solve(self):
+        status, result = self.server.request('POST', '/solve', {'puzzle': PUZZLE})
+        self.assertEqual(status, 200)
+        self.assertEqual(result['status'], 'solved')
+        self.assertEqual(result['solution'], Sudoku.from_string(PUZZLE).solve().to_string())
+
+    def test_solve_with_strategies(self):
+        status, result = self.server.request('POST', '/solve', {'puzzle': PUZZLE, 'strategies': []})
+        self.assertEqual(status, 200)
+        self.assertEqual(result['status'], 'solved')
+
+    def test_no_solution(self):
+        status, result = self.server.request('POST', '/solve', {'puzzle': '12345678-' + '-'*63 + '--------9'})
+        self.assertEqual(status, 200)
+        self.assertEqual(result['status'], 'no solution')
+
+    def test_count(self):
+        status, result = self.server.request('POST', '/count', {'puzzle': PUZZLE})
+        self.assertEqual((status, result['count'], result['unique']), (200, 1, True))
+        status, result = self.server.request('POST', '/count', {'puzzle': EMPTY, 'limit': 3})
+        self.assertEqual((status, result['count'], result['unique']), (200, 3, False))
+
+    def test_validate(self):
+        status, result = self.server.request('POST', '/validate', {'puzzle': PUZZLE})
+        self.assertEqual(status, 200)
+        self.assertEqual(result, {'valid': True, 'filled': 17, 'solved': False})
+        status, result = self.server.request('POST', '/validate', {'puzzle': '11' + '-'*79})
+        self.assertEqual(status, 200)
+        self.assertFalse(result['valid'])
+
+    def test_metrics(self):
+        self.server.request('POST', '/validate', {'puzzle': PUZZLE})
+        status, result = self.server.request('GET', '/metrics')
+        self.assertEqual(status, 200)
+        self.assertGreaterEqual(result['requests']['/validate'], 1)
+        self.assertEqual(result['workers'], 2)
+        for name in ('p50', 'p95', 'p99', 'max'):
+            self.assertIn(name, result['latency'])
+
+    def test_bad_requests(self):
+        for body in ({'puzzle': 5}, {'puzzle': PUZZLE, 'strategies': 5},
+                     {'puzzle': PUZZLE, 'strategies': [[1]]}, {'puzzle': PUZZLE, 'strategies': ['nonsense']},
+                     {'puzzle': PUZZLE, 'timeout': 'soon'}, {'puzzle': '12'}):
+            status, result = self.server.request('POST', '/solve', body)
+            self.assertEqual(status, 400, body)
+            self.assertIn('error', result)
+        for limit in (-1, True, 1.5, 'two'):
+            status, result = self.server.request('POST', '/count', {'puzzle': PUZZLE, 'limit': limit})
+            self.assertEqual(status, 400, limit)
+        self.assertEqual(self.server.request('GET', '/nowhere')[0], 404)
+        self.assertEqual(self.server.request('GET', '/solve')[0], 405)
+
+    def test_bad_request_in_batch(self):
+        # A bad request sent with good ones fails on its own
+        results = self.server.requests([
+            ('POST', '/solve', {'puzzle': PUZZLE, 'strategies': 5}),
+            ('POST', '/solve', {'puzzle': PUZZLE}),
+            ('POST', '/count', {'puzzle': PUZZLE}),
+            ('POST', '/solve', {'puzzle': '11' + '-'*79}),
+        ])
+        self.assertEqual([status for status, result in results], [400, 200, 200, 400])
+        self.assertEqual(results[1][1]['status'], 'solved')
+        self.assertEqual(results[2][1]['count'], 1)
+
+    def test_slow_request_in_batch(self):
+        # Fast requests batched with a slow one are solved by the other
+        # worker within their own timeouts
+        results = self.server.requests(
+            [('POST', '/count', {'puzzle': EMPTY, 'limit': None, 'timeout': 3})] +
+            [('POST', '/solve', {'puzzle': PUZZLE, 'timeout': 2})] * 5)
+        self.assertEqual([status for status, result in results], [504] + [200] * 5)
+
+    def test_failed_job(self):
+        # Errors other than bad puzzles are caught per job too
+        result = run_job(('solve', PUZZLE, {'strategies': 5}, time.time() + 10))
+        self.assertEqual(result['status'], 'failed')
+        self.assertIn('TypeError', result['error'])
+
+    def test_dead_worker(self):
+        # A dead worker breaks the pool, which is then replaced
+        self.server.request('POST', '/solve', {'puzzle': PUZZLE})
+        for pid in list(self.server.service.pool._processes):
+            os.kill(pid, signal.SIGKILL)
+        time.sleep(0.5)
+        status, result = self.server.request('POST', '/solve', {'puzzle': PUZZLE})
+        self.assertIn(status, (200, 500))
+        status, result = self.server.request('POST', '/solve', {'puzzle': PUZZLE})
+        self.assertEqual((status, result['status']), (200, 'solved'))
+        self.assertGreaterEqual(self.server.request('GET', '/metrics')[1]['pool_restarts'], 1)
+
+class TestBusy(unittest.TestCase):
+    def test_busy(self):
+        # One worker, one request per batch and room for one waiting
+        # request: of several slow requests sent at once, some are refused
+        server = ServiceThread(workers=1, batch_size=1, batch_wait=0.0, queue_size=1, timeout=1.0)
+        try:
+            results = server.requests([('POST', '/count', {'puzzle': EMPTY, 'limit': None})] * 6)
+            statuses = [status for status, result in results]
+            self.assertIn(503, statuses)
+            self.assertLessEqual(set(statuses), {503, 504})
+            status, result = server.request('GET', '/metrics')
+            self.assertGreaterEqual(result['responses']['503'], 1)
+        finally:
+            server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
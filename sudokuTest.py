@@ -0,0 +1,218 @@
+# Sudoku Engine Unit Tests
+# Checks parts of the Sudoku engine in sudoku.py that sudokuEngTest.py's
+# solve-and-compare run over sudoku.dat does not reach
+# Uses Python3
+#
+# Licensed under GNU General Public License v3: http://www.gnu.org/licenses/gpl.html
+#
+# Usage: python3 sudokuTest.py
+
+from sudoku import *
+import json
+import random
+import unittest
+
+HARD = '1----7-9--3--2---8--96--5----53--9---1--8---26----4---3------1--4------7--7---3--'
+
+def legal(puzzle):
+    """Return True if no value appears twice in any unit of puzzle"""
+    for unit in index_tables(puzzle.box_size).units:
+        values = [puzzle.values[i] for i in unit if puzzle.values[i]]
+        if len(values) != len(set(values)):
+            return False
+    return True
+
+class TestSingles(unittest.TestCase):
+    def test_cell_reset_after_queued(self):
+        # A queued single that is reset through Cell.set is not filled in
+        puzzle = Sudoku(2)
+        puzzle.set_cell(2, 0, 1)
+        puzzle.set_cell(3, 0, 2)
+        puzzle.set_cell(4, 0, 3)
+        puzzle.cell[0][0].set(0)
+        puzzle.fill_in_all_knowns()
+        self.assertEqual(puzzle.values[:4], [0, 2, 3, 4])
+        self.assertTrue(legal(puzzle))
+
+class TestEdits(unittest.TestCase):
+    def test_random_edits(self):
+        # After any run of edits, the puzzle matches one built afresh from
+        # its values
+        rnd = random.Random(4)
+        for text in (HARD, '1---' '--3-' '-4--' '---2'):
+            puzzle = Sudoku.from_string(text)
+            for i in range(300):
+                row, col = rnd.randrange(puzzle.max_val), rnd.randrange(puzzle.max_val)
+                old = puzzle.values[:]
+                if rnd.random() < 0.3:
+                    puzzle.unset_cell(row, col)
+                elif not puzzle.change_cell(rnd.randint(0, puzzle.max_val), row, col):
+                    self.assertEqual(puzzle.values, old)
+                rebuilt = Sudoku.from_string(values2string(puzzle.values))
+                self.assertEqual(puzzle.values, rebuilt.values)
+                self.assertEqual(puzzle.possibles, rebuilt.possibles)
+                self.assertEqual(puzzle.cells_filled, rebuilt.cells_filled)
+                self.assertTrue(legal(puzzle))
+                self.assertEqual(puzzle.dead_end, rebuilt.dead_end)
+                self.assertEqual(self.pending(puzzle), self.pending(rebuilt))
+
+    def pending(self, puzzle):
+        """Return the set of queued singles that fill_in_all_knowns would
+        fill in"""
+        return set(i for i in puzzle.singles if popcount(puzzle.possibles[i]) == 1)
+
+class Canvas(object):
+    """Stands in for the Tkinter canvas of a SudokuGui, keeping the
+    text of each item and the calls waiting to be run by after"""
+    def __init__(self):
+        self.text = {}
+        self.waiting = []
+
+    def create_rectangle(self, *args, **options):
+        return self.create_text(*args, **options)
+
+    def create_text(self, *args, text='', **options):
+        self.text[len(self.text)] = text
+        return len(self.text) - 1
+
+    def itemconfig(self, item, text=None, **options):
+        if text is not None:
+            self.text[item] = text
+
+    def after(self, ms, function, *args):
+        self.waiting.append((function, args))
+
+    def run_waiting(self):
+        while self.waiting:
+            function, args = self.waiting.pop(0)
+            function(*args)
+
+class TestGuiEdits(unittest.TestCase):
+    def setUp(self):
+        # A SudokuGui drawn on a stand-in canvas, so no display is needed
+        self.gui = SudokuGui.__new__(SudokuGui)
+        gui = self.gui
+        gui.puzzle = Sudoku(3)
+        gui.canvas = Canvas()
+        gui.x, gui.y, gui.xk, gui.yk, gui.cell_pix = 160, 20, 20, 140, 40
+        gui.cell_rtag, gui.cell_vtag = [], []
+        gui.sel_row = gui.sel_col = gui.solver = gui.check_state = None
+        gui.undo_list, gui.redo_list = [], []
+        gui.showing_solution = False
+        gui.draw_puzzle_grid()
+        gui.display_instructions()
+
+    def type_value(self, row, col, char):
+        self.gui.sel_row, self.gui.sel_col = row, col
+        self.gui.process_key(char)
+
+    def shown(self):
+        """Return the cell values displayed, as a string"""
+        return ''.join(self.gui.canvas.text[tag].replace(' ', '-') for row in self.gui.cell_vtag for tag in row)
+
+    def test_undo_redo(self):
+        gui = self.gui
+        self.type_value(0, 0, '1')
+        self.type_value(0, 1, '2')
+        self.type_value(0, 0, '3')
+        self.type_value(0, 1, '0')
+        self.type_value(0, 2, '3') # Refused: 3 is already in row 0
+        self.assertEqual(gui.canvas.text[gui.error_message], 'Cannot set cell to 3')
+        self.assertEqual(len(gui.undo_list), 4)
+        self.assertEqual(self.shown(), '3' + '-'*80)
+        steps = ['32' + '-'*79, '12' + '-'*79, '1' + '-'*80, '-'*81]
+        for text in steps:
+            gui.undo_pressed()
+            self.assertEqual(values2string(gui.puzzle.values), text)
+            self.assertEqual(self.shown(), text)
+        gui.undo_pressed() # Nothing left to undo
+        self.assertEqual(values2string(gui.puzzle.values), '-'*81)
+        for text in reversed(['3' + '-'*80] + steps[:-1]):
+            gui.redo_pressed()
+            self.assertEqual(values2string(gui.puzzle.values), text)
+        self.assertEqual(gui.redo_list, [])
+        self.assertEqual(gui.puzzle.possibles, Sudoku.from_string('3' + '-'*80).possibles)
+        # A new edit drops what was undone
+        gui.undo_pressed()
+        self.type_value(4, 4, '5')
+        self.assertEqual(gui.redo_list, [])
+        gui.redo_pressed()
+        self.assertEqual(values2string(gui.puzzle.values), '32' + '-'*38 + '5' + '-'*40)
+
+    def test_check(self):
+        # Each edit starts a check, dropping any earlier one
+        gui = self.gui
+        for i, char in enumerate(HARD):
+            if char != '-':
+                self.type_value(i // 9, i % 9, char)
+        self.assertEqual(len(gui.canvas.waiting), len(gui.undo_list))
+        gui.canvas.run_waiting()
+        self.assertEqual(gui.canvas.text[gui.check_message], 'Can be solved')
+        self.type_value(0, 1, '2')
+        self.type_value(0, 2, '3')
+        self.type_value(0, 3, '4')
+        gui.canvas.run_waiting()
+        self.assertEqual(gui.canvas.text[gui.check_message], 'No solution')
+        for i in range(3):
+            gui.undo_pressed()
+        gui.canvas.run_waiting()
+        self.assertEqual(gui.canvas.text[gui.check_message], 'Can be solved')
+        self.assertIsNone(gui.check_state)
+
+    def test_no_edits_while_solving(self):
+        gui = self.gui
+        self.type_value(0, 0, '1')
+        gui.solver = object()
+        gui.undo_pressed()
+        self.assertEqual(gui.puzzle.values[0], 1)
+        gui.solver = None
+        gui.undo_pressed()
+        gui.solver = object()
+        gui.redo_pressed()
+        self.assertEqual(gui.puzzle.values[0], 0)
+
+class TestSolve(unittest.TestCase):
+    def test_restart_nodes(self):
+        puzzle = Sudoku.from_string(HARD)
+        for restart_nodes in (0, -5, 2.5, True, '10'):
+            self.assertRaises(ValueError, puzzle.solve, heuristic='random', restart_nodes=restart_nodes)
+        solution = puzzle.solve(heuristic='random', seed=1, restart_nodes=1)
+        self.assertEqual(solution, Sudoku.from_string(HARD).solve())
+
+class TestSolveIter(unittest.TestCase):
+    def test_json_round_trip(self):
+        # Saving the state as JSON after every slice and carrying on from
+        # the saved copy gives the same search as running straight through
+        for heuristic in ('mrv', 'random'):
+            whole = SearchState(Sudoku.from_string(HARD), find_strategies(None), heuristic=heuristic, seed=5)
+            whole.run()
+            puzzle = Sudoku.from_string(HARD)
+            state = SearchState(puzzle, find_strategies(None), heuristic=heuristic, seed=5)
+            slices = 0
+            while True:
+                state = next(puzzle.solve_iter(7, state=state))
+                if state.status != 'paused':
+                    break
+                state = json.loads(json.dumps(state.as_dict()))
+                slices += 1
+            self.assertGreater(slices, 1)
+            self.assertEqual(state.status, 'solved')
+            self.assertEqual(state.nodes, whole.nodes)
+            self.assertEqual(state.solution(), whole.solution())
+
+    def test_slice_nodes(self):
+        puzzle = Sudoku.from_string(HARD)
+        for slice_nodes in (0, -1, 1.5, True, None):
+            self.assertRaises(ValueError, puzzle.solve_iter, slice_nodes)
+
+    def test_stats_on_resume(self):
+        puzzle = Sudoku.from_string(HARD)
+        state = next(puzzle.solve_iter(10))
+        stats = SolveStats()
+        for state in puzzle.solve_iter(10, stats=stats, state=state):
+            pass
+        self.assertEqual(state.status, 'solved')
+        self.assertGreater(stats.branches, 0)
+
+if __name__ == '__main__':
+    unittest.main()